@@ -0,0 +1,168 @@
+"""
+The module evaluates many ConnectFour positions at once with NumPy, without a Python loop over the positions.
+
+The positions are given either as an (N, 6, 7) array of boards like ConnectFour.board,
+or as an (N, 2) array of bitboards like ConnectFour.bitboards.
+For every position it returns the winner, found with shifts of the bitboards,
+and the window_score of the player to move, counted over all 69 windows.
+The positions are processed in chunks, so the memory use does not grow with N.
+
+
+How to run
+---
+Run the benchmark against find_four and window_score called for every board with: python3 batch_evaluation.py
+"""
+import numpy as np
+
+from connect_four import ROWS, COLUMNS, DIRECTIONS, BIT_POSITIONS, WINDOWS
+
+CHUNK_SIZE = 2 ** 16
+
+
+def boards_to_bitboards(boards):
+    """
+    Convert boards to bitboards.
+
+    Args:
+        boards (numpy.ndarray): An (N, 6, 7) array of boards.
+
+    Returns:
+        numpy.ndarray: An (N, 2) uint64 array with the bitboards of player 1 and player 2.
+    """
+    boards = np.asarray(boards)
+    bits = np.left_shift(np.uint64(1), BIT_POSITIONS.astype(np.uint64)).reshape(-1)
+    flat = boards.reshape(len(boards), ROWS * COLUMNS)
+    return np.stack([(flat == player) @ bits for player in (1, 2)], axis=1).astype(np.uint64)
+
+
+def bitboards_to_boards(bitboards):
+    """
+    Convert bitboards to boards.
+
+    Args:
+        bitboards (numpy.ndarray): An (N, 2) array with the bitboards of player 1 and player 2.
+
+    Returns:
+        numpy.ndarray: An (N, 6, 7) int8 array of boards.
+    """
+    bitboards = np.asarray(bitboards, dtype=np.uint64)
+    positions = BIT_POSITIONS.astype(np.uint64)
+    boards = np.zeros((len(bitboards), ROWS, COLUMNS), dtype=np.int8)
+    for player in (1, 2):
+        cells = (bitboards[:, player - 1, np.newaxis, np.newaxis] >> positions) & np.uint64(1)
+        boards[cells == 1] = player
+    return boards
+
+
+def batch_has_four(bitboards):
+    """
+    Check many bitboards of single players for a line of four checkers, as connect_four.has_four does.
+
+    Args:
+        bitboards (numpy.ndarray): An array of bitboards.
+
+    Returns:
+        numpy.ndarray: A bool array, True where a line of four checkers is found.
+    """
+    bitboards = np.asarray(bitboards, dtype=np.uint64)
+    found = np.zeros(bitboards.shape, dtype=bool)
+    for shift in DIRECTIONS:
+        pairs = bitboards & (bitboards >> np.uint64(shift))
+        found |= (pairs & (pairs >> np.uint64(2 * shift))) != 0
+    return found
+
+
+def batch_window_score(boards, players):
+    """
+    Score many boards with the open windows of four cells, as connect_four.window_score does.
+
+    Args:
+        boards (numpy.ndarray): An (N, 6, 7) array of boards.
+        players (numpy.ndarray): The IDs of the players (1 or 2) the scores are given for.
+
+    Returns:
+        numpy.ndarray: The scores, limited to -99...99.
+    """
+    boards = np.asarray(boards)
+    players = np.asarray(players).reshape(-1, 1, 1)
+    cells = boards.reshape(len(boards), ROWS * COLUMNS)[:, WINDOWS]
+    own = np.count_nonzero(cells == players, axis=2)
+    other = np.count_nonzero(cells == 3 - players, axis=2)
+    score = 5 * (np.count_nonzero((own == 3) & (other == 0), axis=1)
+                 - np.count_nonzero((other == 3) & (own == 0), axis=1)) \
+        + 2 * (np.count_nonzero((own == 2) & (other == 0), axis=1)
+               - np.count_nonzero((other == 2) & (own == 0), axis=1))
+    return np.clip(score, -99, 99)
+
+
+def evaluate_batch(positions, chunk_size=CHUNK_SIZE):
+    """
+    Find the winner and the heuristic score of many positions.
+
+    Args:
+        positions (numpy.ndarray): An (N, 6, 7) array of boards or an (N, 2) array of bitboards.
+        chunk_size (int): The number of positions processed at once.
+
+    Returns:
+        tuple: Two arrays of length N. The first one has the ID of the player with four in a row (1 or 2)
+               or 0 if there is none. The second one has the window_score of the player to move,
+               which is player 1 if both players have the same number of checkers.
+
+    Raises:
+        ValueError: If the positions do not have a valid shape.
+    """
+    positions = np.asarray(positions)
+    if positions.ndim == 3 and positions.shape[1:] == (ROWS, COLUMNS):
+        is_boards = True
+    elif positions.ndim == 2 and positions.shape[1] == 2:
+        is_boards = False
+    else:
+        raise ValueError(f'Expected an (N, {ROWS}, {COLUMNS}) array of boards '
+                         f'or an (N, 2) array of bitboards, got {positions.shape}')
+
+    winners = np.zeros(len(positions), dtype=np.int8)
+    scores = np.zeros(len(positions), dtype=np.int16)
+    for start in range(0, len(positions), chunk_size):
+        chunk = positions[start:start + chunk_size]
+        if is_boards:
+            boards, bitboards = chunk, boards_to_bitboards(chunk)
+        else:
+            boards, bitboards = bitboards_to_boards(chunk), chunk.astype(np.uint64)
+        wins = batch_has_four(bitboards)
+        winners[start:start + chunk_size] = np.where(wins[:, 0], 1, np.where(wins[:, 1], 2, 0))
+        flat = boards.reshape(len(boards), -1)
+        players = np.where(np.count_nonzero(flat == 1, axis=1) > np.count_nonzero(flat == 2, axis=1), 2, 1)
+        scores[start:start + chunk_size] = batch_window_score(boards, players)
+    return winners, scores
+
+
+if __name__ == '__main__':
+    import random
+    import time
+    from connect_four import ConnectFour, find_four, window_score
+
+    random.seed(0)
+    boards = []
+    for _ in range(2000):
+        game = ConnectFour([None, None])
+        for _ in range(random.randint(0, 30)):
+            if game.is_over():
+                break
+            game.play_move(random.choice(game.possible_moves()))
+        boards.append(game.board)
+    boards = np.array(boards * 50, dtype=np.int8)
+
+    start = time.perf_counter()
+    winners, scores = evaluate_batch(boards)
+    batch_time = time.perf_counter() - start
+
+    sample = boards[:5000]
+    start = time.perf_counter()
+    for board, winner, score in zip(sample, winners, scores):
+        loop_winner = 1 if find_four(board, 1) else (2 if find_four(board, 2) else 0)
+        player = 2 if np.count_nonzero(board == 1) > np.count_nonzero(board == 2) else 1
+        assert loop_winner == winner and window_score(board, player) == score
+    loop_time = (time.perf_counter() - start) * len(boards) / len(sample)
+
+    print(f'{len(boards)} boards: batch {batch_time:.2f} s ({len(boards) / batch_time:.0f} boards/s), '
+          f'loop {loop_time:.2f} s (estimated), speedup {loop_time / batch_time:.1f}x')
@@ -0,0 +1,189 @@
+"""
+The module is a benchmark suite of the ConnectFour search on a fixed set of positions
+(opening, midgame and near-endgame).
+
+For every position it reports:
+- for the Solver from solver.py: nodes per second, the time to reach every depth and the transposition table hit rate,
+- for easyAI's Negamax: the number of calls and the time spent in ConnectFour.make_move, unmake_move,
+  possible_moves and lose, measured with connect_four.instrumented.
+
+The results can be saved as JSON and compared with the results of an earlier version
+to catch performance regressions.
+
+
+How to run
+---
+Run the benchmark with: python3 benchmark.py
+Save the results with: python3 benchmark.py --output baseline.json
+Compare with saved results with: python3 benchmark.py --baseline baseline.json
+The comparison fails if the nodes per second of any position dropped by more than --tolerance (20% by default).
+"""
+import argparse
+import json
+import sys
+
+from easyAI import Negamax
+
+from connect_four import ConnectFour, instrumented
+from solver import Solver
+
+# name: (moves leading to the position, Solver depth, Negamax depth)
+POSITIONS = {
+    'opening': ([], 12, 8),
+    'midgame': ([3, 3, 3, 3, 3, 3, 2, 4, 2, 2, 2, 2, 2, 4], 14, 8),
+    'near-endgame': ([3, 3, 3, 3, 1, 2, 3, 3, 0, 2, 2, 2, 6, 2, 4, 5, 4, 2, 4, 4, 4, 4, 1, 1, 1, 1, 1, 0, 5, 5], 12, 10),
+}
+
+
+def create_game(moves, game_class=ConnectFour):
+    """
+    Create a game after the given moves.
+
+    Args:
+        moves (list): The columns of the moves.
+        game_class (type): The game class.
+
+    Returns:
+        ConnectFour: The game.
+    """
+    game = game_class([None, None])
+    for move in moves:
+        game.play_move(move)
+    return game
+
+
+def benchmark_solver(moves, depth, repeat=3):
+    """
+    Search a position with a new Solver, a few times, and keep the fastest search.
+
+    Args:
+        moves (list): The moves leading to the position.
+        depth (int): The search depth.
+        repeat (int): The number of searches.
+
+    Returns:
+        dict: The move, the score, the nodes, the nodes per second, the time to reach every depth
+              and the transposition table hit rate.
+    """
+    solver = None
+    for _ in range(repeat):
+        candidate = Solver(depth)
+        move = candidate(create_game(moves))
+        if solver is None or candidate.elapsed < solver.elapsed:
+            solver = candidate
+    return {
+        'move': move,
+        'score': solver.score,
+        'depth': solver.depth_reached,
+        'nodes': solver.nodes,
+        'seconds': round(solver.elapsed, 4),
+        'nodes_per_second': round(solver.nodes_per_second),
+        'time_to_depth': [round(seconds, 4) for seconds in solver.depth_times],
+        'tt_hit_rate': round(solver.tt.hit_rate, 4),
+    }
+
+
+def benchmark_negamax(moves, depth):
+    """
+    Search a position with easyAI's Negamax on an instrumented game.
+
+    Args:
+        moves (list): The moves leading to the position.
+        depth (int): The search depth.
+
+    Returns:
+        dict: The move and, for every measured method, the number of calls,
+              the total time and the time per call in microseconds.
+    """
+    game_class = instrumented(ConnectFour)
+    game = create_game(moves, game_class)
+    game_class.reset_stats()
+    move = Negamax(depth)(game)
+    return {
+        'move': move,
+        'calls': {
+            name: {'calls': calls, 'seconds': round(seconds, 4), 'us_per_call': round(seconds / calls * 1e6, 2) if calls else None}
+            for name, (calls, seconds) in game_class.call_stats.items()
+        },
+    }
+
+
+def run_benchmark(repeat=3):
+    """
+    Run the benchmark on all the positions.
+
+    Args:
+        repeat (int): The number of Solver searches of every position.
+
+    Returns:
+        dict: The results by position name.
+    """
+    return {
+        name: {'solver': benchmark_solver(moves, solver_depth, repeat),
+               'negamax': benchmark_negamax(moves, negamax_depth)}
+        for name, (moves, solver_depth, negamax_depth) in POSITIONS.items()
+    }
+
+
+def print_results(results):
+    """
+    Print the results of the benchmark.
+
+    Args:
+        results (dict): The results by position name.
+    """
+    for name, result in results.items():
+        solver = result['solver']
+        print(f'{name}:')
+        print(f'  Solver: move {solver["move"]}, depth {solver["depth"]}, {solver["nodes"]} nodes in '
+              f'{solver["seconds"]:.2f} s, {solver["nodes_per_second"]} nodes/s, TT hit rate {solver["tt_hit_rate"]:.1%}')
+        print('    time to depth: ' + ', '.join(f'{depth}: {seconds:.3f} s'
+                                                 for depth, seconds in enumerate(solver['time_to_depth'], start=1)))
+        print(f'  Negamax: move {result["negamax"]["move"]}')
+        for method, stats in result['negamax']['calls'].items():
+            print(f'    {method}: {stats["calls"]} calls, {stats["seconds"]:.3f} s, {stats["us_per_call"]} us/call')
+
+
+def compare_results(results, baseline, tolerance):
+    """
+    Compare the nodes per second of the Solver with the baseline results.
+
+    Args:
+        results (dict): The current results.
+        baseline (dict): The earlier results.
+        tolerance (float): The allowed relative drop of nodes per second.
+
+    Returns:
+        bool: True if no position got slower by more than the tolerance.
+    """
+    passed = True
+    for name, result in results.items():
+        if name not in baseline:
+            continue
+        current = result['solver']['nodes_per_second']
+        previous = baseline[name]['solver']['nodes_per_second']
+        change = current / previous - 1 if previous else 0.0
+        regression = change < -tolerance
+        passed = passed and not regression
+        print(f'{name}: {previous} -> {current} nodes/s ({change:+.1%}){" REGRESSION" if regression else ""}')
+    return passed
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Benchmark the ConnectFour search.')
+    parser.add_argument('--output', default=None, help='save the results to this JSON file')
+    parser.add_argument('--baseline', default=None, help='compare with the results saved in this JSON file')
+    parser.add_argument('--repeat', type=int, default=3, help='number of Solver searches of every position')
+    parser.add_argument('--tolerance', type=float, default=0.2, help='allowed relative drop of nodes per second')
+    args = parser.parse_args()
+
+    results = run_benchmark(args.repeat)
+    print_results(results)
+    if args.output:
+        with open(args.output, 'w') as file:
+            json.dump(results, file, indent=2)
+    if args.baseline:
+        with open(args.baseline) as file:
+            baseline = json.load(file)
+        if not compare_results(results, baseline, args.tolerance):
+            sys.exit(1)
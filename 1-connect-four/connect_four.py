@@ -1,3 +1,6 @@
+import functools
+import time
+
 from easyAI import TwoPlayerGame
 import numpy as np
 
@@ -25,60 +28,208 @@ Authors: Adam Łuszcz, Anna Rogala
 """
 
 
+ROWS = 6
+COLUMNS = 7
+CONNECT = 4
+# Every column takes ROWS bits plus one always-empty sentinel bit on top,
+# so that shifts never carry a checker over into the neighbouring column.
+COLUMN_HEIGHT = ROWS + 1
+DIRECTIONS = (1, COLUMN_HEIGHT, COLUMN_HEIGHT - 1, COLUMN_HEIGHT + 1)
+# The bit index of every cell of the 6x7 grid.
+BIT_POSITIONS = np.arange(COLUMNS, dtype=np.int64)[np.newaxis, :] * COLUMN_HEIGHT \
+    + np.arange(ROWS, dtype=np.int64)[:, np.newaxis]
+
+
+class BoardTables:
+    def __init__(self, rows, columns, connect):
+        """
+        Precompute the tables of a board size, shared by all the games of that size.
+
+        Args:
+            rows (int): The number of rows.
+            columns (int): The number of columns.
+            connect (int): The number of checkers in a row needed to win.
+
+        Attributes:
+            - column_height (int): The number of bits of a column in a bitboard, rows plus a sentinel bit.
+            - windows (numpy.ndarray): Flat indices into the rows x columns grid of every line of ``connect`` cells.
+            - lines (tuple): The bitmask of every line of ``connect`` cells.
+            - cell_lines (list): For every bit index, the bitmasks of the lines passing through that cell.
+        """
+        self.rows = rows
+        self.columns = columns
+        self.connect = connect
+        self.column_height = rows + 1
+        cells = [
+            [(row + k * dr, col + k * dc) for k in range(connect)]
+            for row in range(rows)
+            for col in range(columns)
+            for dr, dc in [(1, 0), (0, 1), (1, 1), (1, -1)]
+            if 0 <= row + (connect - 1) * dr < rows and 0 <= col + (connect - 1) * dc < columns
+        ]
+        self.windows = np.array([[row * columns + col for row, col in line] for line in cells], dtype=np.int64)
+        self.lines = tuple(sum(1 << (col * self.column_height + row) for row, col in line) for line in cells)
+        self.cell_lines = [() for _ in range(columns * self.column_height)]
+        for line, mask in zip(cells, self.lines):
+            for row, col in line:
+                position = col * self.column_height + row
+                self.cell_lines[position] += (mask,)
+
+    def __deepcopy__(self, memo):
+        # The tables never change, so the copies of a game can share them.
+        return self
+
+
+@functools.lru_cache(maxsize=None)
+def board_tables(rows=ROWS, columns=COLUMNS, connect=CONNECT):
+    """
+    Get the precomputed tables of a board size. They are computed once per size.
+
+    Args:
+        rows (int): The number of rows.
+        columns (int): The number of columns.
+        connect (int): The number of checkers in a row needed to win.
+
+    Returns:
+        BoardTables: The tables.
+    """
+    return BoardTables(rows, columns, connect)
+
+
+# Flat indices into the 6x7 grid of the 69 windows of four cells in a row.
+WINDOWS = board_tables().windows
+
+
 class ConnectFour(TwoPlayerGame):
-    def __init__(self, players):
+    def __init__(self, players, rows=ROWS, columns=COLUMNS, connect=CONNECT):
         """
         Initialize a ConnectFour game.
 
         Args:
             players (list): A list of two players (e.g., Human_Player, AI_Player) representing
                             the two participants in the game.
+            rows (int): The number of rows of the board, 6 by default.
+            columns (int): The number of columns of the board, 7 by default.
+            connect (int): The number of checkers in a row needed to win, 4 by default.
 
         Attributes:
             - players (list): The list of players.
-            - board (numpy.ndarray): A 6x7 grid representing the game board.
+            - tables (BoardTables): The precomputed tables of the board size.
+            - bitboards (list): Two integers, one per player, with a bit set for every checker.
+                                Bit ``column * (rows + 1) + row`` stands for the cell in the given column and row.
+            - heights (list): The number of checkers in each column.
             - current_player (int): The ID of the current player (1 or 2).
+            - moves (list): The columns of the moves made so far, in order.
+            - winner (int): The ID of the player who has four (or ``connect``) in a row, or 0 if there is none yet.
         """
         self.players = players
-        self.board = np.zeros((6, 7), dtype=int)
+        self.rows = rows
+        self.columns = columns
+        self.connect = connect
+        self.tables = board_tables(rows, columns, connect)
+        self.bitboards = [0, 0]
+        self.heights = [0] * columns
         self.current_player = 1
+        self.moves = []
+        self.winner = 0
+
+    @property
+    def board(self):
+        """
+        A rows x columns (6x7 by default) grid view of the game board, built from the bitboards.
+
+        Returns:
+            numpy.ndarray: The board with 0 for an empty cell and 1 or 2 for a player's checker.
+                           Row 0 is the bottom row.
+        """
+        return bitboards_to_array(self.bitboards, self.rows, self.columns)
+
+    @board.setter
+    def board(self, board):
+        """
+        Load the game state from a grid of the size of the game.
+
+        Args:
+            board (numpy.ndarray): The board with 0 for an empty cell and 1 or 2 for a player's checker.
+
+        Raises:
+            ValueError: If the board does not have the size of the game.
+        """
+        board = np.asarray(board)
+        if board.shape != (self.rows, self.columns):
+            raise ValueError(f'Expected a {self.rows}x{self.columns} board, got {board.shape}')
+        self.bitboards = [array_to_bitboard(board, 1), array_to_bitboard(board, 2)]
+        self.heights = [int(np.count_nonzero(board[:, col])) for col in range(self.columns)]
+        self.moves = []
+        self.winner = next((player for player in (1, 2)
+                            if has_four(self.bitboards[player - 1], self.rows + 1, self.connect)), 0)
+
+    @property
+    def last_move(self):
+        """
+        The column of the last move, or None before the first move.
+        """
+        return self.moves[-1] if self.moves else None
 
     def possible_moves(self):
         """
         Get a list of possible moves (columns) that the current player can make.
 
         Returns:
-            list: A list of column numbers (0-6) where a checker can be placed.
+            list: A list of column numbers (0-6 by default) where a checker can be placed.
         """
-        moves = []
-        for i in range(7):
-            for row in self.board:
-                if row[i] == 0:
-                    moves.append(i)
-                    break
-        return moves
+        return [col for col in range(self.columns) if self.heights[col] < self.rows]
 
     def make_move(self, column):
         """
         Make a move by placing the current player's checker in the specified column.
 
+        Only the lines passing through the new checker, taken from the precomputed tables,
+        are checked for a win, and the result is kept in ``winner`` for ``lose``, ``is_over`` and ``scoring``.
+
         Args:
             column (int): The column where the checker is to be placed.
         """
-        for row in range(6):
-            if self.board[row, column] == 0:
-                self.board[row, column] = self.current_player
-                break
+        position = column * self.tables.column_height + self.heights[column]
+        bitboard = self.bitboards[self.current_player - 1] | (1 << position)
+        self.bitboards[self.current_player - 1] = bitboard
+        self.heights[column] += 1
+        self.moves.append(column)
+        if not self.winner:
+            for line in self.tables.cell_lines[position]:
+                if bitboard & line == line:
+                    self.winner = self.current_player
+                    break
+
+    def unmake_move(self, column):
+        """
+        Undo a move by removing the top checker from the specified column.
+
+        Like ``make_move``, it does not switch ``current_player``; easyAI switches the player
+        back before calling it, so the search can run on a single game object without copying it.
+
+        Args:
+            column (int): The column of the move to undo.
+        """
+        self.heights[column] -= 1
+        mask = ~(1 << (column * self.tables.column_height + self.heights[column]))
+        self.bitboards[0] &= mask
+        self.bitboards[1] &= mask
+        if self.moves and self.moves[-1] == column:
+            self.moves.pop()
+        if self.winner and not has_four(self.bitboards[self.winner - 1], self.rows + 1, self.connect):
+            self.winner = 0
 
     def show(self):
         """
         Display the current state of the game board.
         """
-        for row in range(6):
-            row_str = ' '.join([['.', '1', '2'][self.board[5 - row][col]] for col in range(7)])
+        board = self.board
+        for row in range(self.rows):
+            row_str = ' '.join([['.', '1', '2'][board[self.rows - 1 - row][col]] for col in range(self.columns)])
             print(row_str)
-        print("-" * 13)
-        print("0 1 2 3 4 5 6")
+        print("-" * (2 * self.columns - 1))
+        print(' '.join(str(col) for col in range(self.columns)))
 
     def lose(self):
         """
@@ -87,7 +238,7 @@ class ConnectFour(TwoPlayerGame):
         Returns:
             bool: True if the current player has lost, False otherwise.
         """
-        return find_four(self.board, self.opponent_index)
+        return self.winner == self.opponent_index
 
     def is_over(self):
         """
@@ -96,7 +247,7 @@ class ConnectFour(TwoPlayerGame):
         Returns:
             bool: True if the game is over, False otherwise.
         """
-        return (self.board.min() > 0) or self.lose()
+        return (min(self.heights) == self.rows) or self.lose()
 
     def scoring(self):
         """
@@ -108,37 +259,185 @@ class ConnectFour(TwoPlayerGame):
         return -100 if self.lose() else 0
 
 
-def find_four(board, opponent_player):
+def has_four(bitboard, column_height=COLUMN_HEIGHT, connect=CONNECT):
     """
-    Check if a player has formed a line of four checkers on the game board.
+    Check if a bitboard contains a line of four (or ``connect``) checkers.
+
+    Every direction is checked with shift-and-mask steps, each one doubling the length of the lines found so far:
+    the first one keeps the checkers that have a neighbour, the second one the pairs that have a neighbouring pair.
+
+    Args:
+        bitboard (int): The bitboard of a single player.
+        column_height (int): The number of bits of a column, the number of rows plus one.
+        connect (int): The number of checkers in a row needed to win.
+
+    Returns:
+        bool: True if a line of four checkers is found, False otherwise.
+    """
+    directions = DIRECTIONS if column_height == COLUMN_HEIGHT else \
+        (1, column_height, column_height - 1, column_height + 1)
+    if connect == 4:
+        for shift in directions:
+            pairs = bitboard & (bitboard >> shift)
+            if pairs & (pairs >> 2 * shift):
+                return True
+        return False
+    for shift in directions:
+        lines = bitboard
+        length = 1
+        while length < connect:
+            step = min(length, connect - length)
+            lines &= lines >> (step * shift)
+            length += step
+        if lines:
+            return True
+    return False
+
+
+def array_to_bitboard(board, player):
+    """
+    Convert the checkers of a single player on a grid to a bitboard.
+
+    Args:
+        board (numpy.ndarray): The game board.
+        player (int): The ID of the player (1 or 2).
+
+    Returns:
+        int: The bitboard of the player.
+    """
+    board = np.asarray(board)
+    column_height = board.shape[0] + 1
+    bitboard = 0
+    for row, col in zip(*np.nonzero(board == player)):
+        bitboard |= 1 << (int(col) * column_height + int(row))
+    return bitboard
+
+
+def bitboards_to_array(bitboards, rows=ROWS, columns=COLUMNS):
+    """
+    Convert the bitboards of both players to a grid.
+
+    Args:
+        bitboards (list): Two bitboards, for player 1 and player 2.
+        rows (int): The number of rows.
+        columns (int): The number of columns.
+
+    Returns:
+        numpy.ndarray: The game board.
+    """
+    board = np.zeros((rows, columns), dtype=int)
+    if rows == ROWS and columns == COLUMNS:
+        for player, bitboard in enumerate(bitboards, start=1):
+            board[(np.int64(bitboard) >> BIT_POSITIONS) & 1 == 1] = player
+        return board
+    # Larger boards do not fit into a 64-bit integer, so they are converted column by column.
+    row_bits = np.arange(rows)
+    for player, bitboard in enumerate(bitboards, start=1):
+        for col in range(columns):
+            column_bits = (bitboard >> (col * (rows + 1))) & ((1 << rows) - 1)
+            board[(column_bits >> row_bits) & 1 == 1, col] = player
+    return board
+
+
+def find_four(board, opponent_player, connect=CONNECT):
+    """
+    Check if a player has formed a line of four (or ``connect``) checkers on the game board.
 
     Args:
         board (numpy.ndarray): The game board.
         opponent_player (int): The ID of the opponent player (1 or 2).
+        connect (int): The number of checkers in a row needed to win.
 
     Returns:
         bool: True if a line of four checkers is found, False otherwise.
     """
-    directions = [(1, 0), (0, 1), (1, 1), (1, -1)]
+    return has_four(array_to_bitboard(board, opponent_player), np.shape(board)[0] + 1, connect)
 
-    for i in range(6):
-        for j in range(7):
-            for dr, dc in directions:
-                for k in range(4):
-                    r, c = i + k * dr, j + k * dc
-                    if 0 <= r < 6 and 0 <= c < 7 and board[r, c] == opponent_player:
-                        if k == 3:
-                            return True
-                    else:
-                        break
 
-    return False
+def window_score(board, player, connect=CONNECT):
+    """
+    Score a position by counting the open windows of four (or ``connect``) cells of both players.
+
+    A window is open for a player if the opponent has no checker in it.
+    All the windows (69 on the 6x7 board) are counted at once with the precomputed index array of the board size.
+
+    Args:
+        board (numpy.ndarray): The game board.
+        player (int): The ID of the player (1 or 2) the score is given for.
+        connect (int): The number of checkers in a row needed to win.
+
+    Returns:
+        int: 5 points for every open window with 3 (``connect - 1``) checkers and 2 points for every open window
+             with 2 (``connect - 2``) checkers of the player, minus the same for the opponent, limited to -99...99.
+    """
+    board = np.asarray(board)
+    windows = WINDOWS if board.shape == (ROWS, COLUMNS) and connect == CONNECT \
+        else board_tables(board.shape[0], board.shape[1], connect).windows
+    cells = board.ravel()[windows]
+    own = np.count_nonzero(cells == player, axis=1)
+    other = np.count_nonzero(cells == 3 - player, axis=1)
+    three, two = connect - 1, connect - 2
+    score = 5 * (np.count_nonzero((own == three) & (other == 0)) - np.count_nonzero((other == three) & (own == 0))) \
+        + 2 * (np.count_nonzero((own == two) & (other == 0)) - np.count_nonzero((other == two) & (own == 0)))
+    return max(-99, min(99, int(score)))
+
+
+def heuristic_scoring(game):
+    """
+    Heuristic scoring for the game, to be used with easyAI's Negamax, e.g. Negamax(4, heuristic_scoring).
+
+    Args:
+        game (ConnectFour): The game to score.
+
+    Returns:
+        int: -100 if the current player has lost, otherwise the window_score of the current player.
+    """
+    return -100 if game.lose() else window_score(game.board, game.current_player, game.connect)
+
+
+def instrumented(game_class=ConnectFour, methods=('make_move', 'unmake_move', 'possible_moves', 'lose')):
+    """
+    Create a subclass of a game class that counts the calls and the time of the given methods.
+
+    The game class itself is not changed, so the counting costs nothing when it is not used.
+
+    Args:
+        game_class (type): The game class, e.g. ConnectFour.
+        methods (tuple): The names of the methods to measure.
+
+    Returns:
+        type: The subclass. Its ``call_stats`` dictionary maps a method name to [number of calls, total seconds]
+              and ``reset_stats()`` clears it.
+    """
+    def measure(name, method):
+        def wrapper(self, *args):
+            start = time.perf_counter()
+            result = method(self, *args)
+            stats = self.call_stats[name]
+            stats[0] += 1
+            stats[1] += time.perf_counter() - start
+            return result
+        wrapper.__name__ = name
+        wrapper.__doc__ = method.__doc__
+        return wrapper
+
+    def reset_stats(cls):
+        cls.call_stats = {name: [0, 0.0] for name in methods}
+
+    attributes = {name: measure(name, getattr(game_class, name)) for name in methods}
+    attributes['reset_stats'] = classmethod(reset_stats)
+    attributes['call_stats'] = {name: [0, 0.0] for name in methods}
+    return type('Instrumented' + game_class.__name__, (game_class,), attributes)
 
 
 if __name__ == '__main__':
-    from easyAI import Human_Player, AI_Player, Negamax
+    import os
+    from easyAI import Human_Player, AI_Player
+    from solver import Solver
+    from opening_book import OpeningBook
 
-    ai = Negamax(6)
+    book = OpeningBook('opening_book.bin') if os.path.isfile('opening_book.bin') else None
+    ai = Solver(12, book=book)
     game = ConnectFour([Human_Player(), AI_Player(ai)])
     game.play()
     if game.lose():
@@ -0,0 +1,168 @@
+"""
+The module contains a persistent cache of the Solver results, shared between games and processes.
+
+Every entry holds the best move, the score and the search depth of a position.
+A position and its left/right mirror image share one entry, keyed like in opening_book.py.
+The cache is an SQLite database in WAL mode, so many worker processes can read and write it at once.
+When it grows over the maximum number of entries, the least recently used entries are removed.
+The lookups only read the database: the last use of an entry is refreshed at most once per touch interval,
+and the refreshes are written in batches, so the readers do not wait for each other on the write lock.
+
+
+How to run
+---
+Use it with: Solver(12, cache=EvaluationCache('evaluations.db'))
+or for all the games of the simulator: python3 simulate.py solver:10 solver:8 --games 100 --cache evaluations.db
+"""
+import os
+import sqlite3
+import time
+
+from opening_book import canonical_key
+from connect_four import COLUMNS
+
+
+class EvaluationCache:
+    def __init__(self, filename, max_entries=1000000, eviction_interval=1000, touch_interval=60, touch_batch=100):
+        """
+        Open the cache, creating the database file if it does not exist.
+
+        Args:
+            filename (str): The path to the database file.
+            max_entries (int): The maximum number of entries kept.
+            eviction_interval (int): The number of stores between the checks of the size.
+            touch_interval (float): The time in seconds after which a lookup refreshes the last use of an entry.
+            touch_batch (int): The number of refreshes written to the database at once.
+
+        Attributes:
+            - hits (int): The number of lookups that found the position in this process.
+            - lookups (int): The number of lookups in this process.
+        """
+        self.filename = filename
+        self.max_entries = max_entries
+        self.eviction_interval = eviction_interval
+        self.touch_interval = touch_interval
+        self.touch_batch = touch_batch
+        self.hits = 0
+        self.lookups = 0
+        self.stores = 0
+        self._touched = {}
+        self._connection = None
+        self._pid = None
+        self.connection.executescript('''
+            CREATE TABLE IF NOT EXISTS positions (
+                key INTEGER PRIMARY KEY,
+                depth INTEGER NOT NULL,
+                score INTEGER NOT NULL,
+                move INTEGER NOT NULL,
+                last_used REAL NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS positions_last_used ON positions (last_used);
+        ''')
+
+    @property
+    def connection(self):
+        """
+        The database connection of the current process.
+
+        A connection must not be shared between processes, so a new one is opened after a fork.
+        """
+        if self._connection is None or self._pid != os.getpid():
+            self._connection = sqlite3.connect(self.filename, timeout=30, isolation_level=None)
+            self._connection.execute('PRAGMA journal_mode=WAL')
+            self._connection.execute('PRAGMA synchronous=NORMAL')
+            self._pid = os.getpid()
+        return self._connection
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        state['_connection'] = None
+        state['_pid'] = None
+        state['_touched'] = {}
+        return state
+
+    def lookup(self, current, mask):
+        """
+        Find a position in the cache and mark it as recently used.
+
+        Args:
+            current (int): The bitboard of the player to move.
+            mask (int): The bitboard of all checkers.
+
+        Returns:
+            tuple: The best move, the score and the search depth, or None if the position is not in the cache.
+        """
+        self.lookups += 1
+        key, mirrored = canonical_key(current, mask)
+        row = self.connection.execute('SELECT move, score, depth, last_used FROM positions WHERE key = ?',
+                                      (key,)).fetchone()
+        if row is None:
+            return None
+        self.hits += 1
+        move, score, depth, last_used = row
+        now = time.time()
+        if now - last_used > self.touch_interval:
+            self._touched[key] = now
+            if len(self._touched) >= self.touch_batch:
+                self.flush()
+        return (COLUMNS - 1 - move if mirrored else move), score, depth
+
+    def store(self, current, mask, move, score, depth):
+        """
+        Store the result of a search. An entry searched deeper is not replaced.
+
+        Args:
+            current (int): The bitboard of the player to move.
+            mask (int): The bitboard of all checkers.
+            move (int): The best move.
+            score (int): The score of the best move.
+            depth (int): The search depth.
+        """
+        key, mirrored = canonical_key(current, mask)
+        if mirrored:
+            move = COLUMNS - 1 - move
+        self.connection.execute('''
+            INSERT INTO positions (key, depth, score, move, last_used) VALUES (?, ?, ?, ?, ?)
+            ON CONFLICT (key) DO UPDATE SET
+                depth = excluded.depth, score = excluded.score, move = excluded.move, last_used = excluded.last_used
+            WHERE excluded.depth >= positions.depth
+        ''', (key, depth, score, move, time.time()))
+        self.stores += 1
+        if self.stores % self.eviction_interval == 0:
+            self.evict()
+
+    def flush(self):
+        """
+        Write the pending refreshes of the last use of the entries in one transaction.
+        """
+        touched, self._touched = self._touched, {}
+        if not touched:
+            return
+        self.connection.execute('BEGIN')
+        self.connection.executemany('UPDATE positions SET last_used = MAX(last_used, ?) WHERE key = ?',
+                                    [(used, key) for key, used in touched.items()])
+        self.connection.execute('COMMIT')
+
+    def evict(self):
+        """
+        Remove the least recently used entries over the maximum number of entries.
+        """
+        self.flush()
+        count = self.connection.execute('SELECT COUNT(*) FROM positions').fetchone()[0]
+        if count > self.max_entries:
+            self.connection.execute('''
+                DELETE FROM positions WHERE key IN (SELECT key FROM positions ORDER BY last_used LIMIT ?)
+            ''', (count - self.max_entries,))
+
+    def __len__(self):
+        return self.connection.execute('SELECT COUNT(*) FROM positions').fetchone()[0]
+
+    def close(self):
+        """
+        Close the database connection of the current process.
+        """
+        if self._connection is not None:
+            if self._pid == os.getpid():
+                self.flush()
+            self._connection.close()
+            self._connection = None
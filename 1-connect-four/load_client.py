@@ -0,0 +1,130 @@
+"""
+The module is a load generator for the ConnectFour server from server.py.
+
+It opens the given number of connections at once. Every connection plays games with random moves
+against the AI until the given number of games is played, and measures the time from sending
+a move to receiving the answer. At the end it prints the p50 and p99 move latency and the throughput.
+
+
+How to run
+---
+Start the server with: python3 server.py --port 8765
+and run e.g.: python3 load_client.py --port 8765 --concurrency 50 --games 200 --ai solver:8
+"""
+import argparse
+import asyncio
+import json
+import random
+import time
+
+
+async def request(reader, writer, message):
+    """
+    Send a request and wait for the answer.
+
+    Args:
+        reader (asyncio.StreamReader): The stream of the answers.
+        writer (asyncio.StreamWriter): The stream of the requests.
+        message (dict): The request.
+
+    Returns:
+        dict: The answer.
+
+    Raises:
+        RuntimeError: If the server answers with an error.
+    """
+    writer.write(json.dumps(message).encode() + b'\n')
+    await writer.drain()
+    answer = json.loads(await reader.readline())
+    if 'error' in answer:
+        raise RuntimeError(answer['error'])
+    return answer
+
+
+async def client(host, port, games, ai, latencies, rng):
+    """
+    Play games against the AI over one connection.
+
+    Args:
+        host (str): The address of the server.
+        port (int): The port of the server.
+        games (list): A shared list with one item per game left to play.
+        ai (str): The specification of the AI.
+        latencies (list): The move latencies in seconds are appended to it.
+        rng (random.Random): The random number generator of the moves.
+    """
+    reader, writer = await asyncio.open_connection(host, port)
+    try:
+        while games:
+            games.pop()
+            state = await request(reader, writer, {'command': 'new', 'ai': ai})
+            while not state['over']:
+                top_row = state['board'][-1]
+                column = rng.choice([col for col, cell in enumerate(top_row) if cell == 0])
+                start = time.perf_counter()
+                state = await request(reader, writer, {'command': 'move', 'session': state['session'], 'column': column})
+                latencies.append(time.perf_counter() - start)
+            await request(reader, writer, {'command': 'close', 'session': state['session']})
+    finally:
+        writer.close()
+
+
+def percentile(values, fraction):
+    """
+    Get a percentile of the values.
+
+    Args:
+        values (list): The sorted values.
+        fraction (float): The percentile as a fraction, e.g. 0.99.
+
+    Returns:
+        float: The value below which the given fraction of the values falls.
+    """
+    return values[min(len(values) - 1, int(fraction * len(values)))]
+
+
+async def run_load(host, port, concurrency, games, ai, seed=0):
+    """
+    Play the games over the given number of connections at once.
+
+    Args:
+        host (str): The address of the server.
+        port (int): The port of the server.
+        concurrency (int): The number of connections.
+        games (int): The number of games in total.
+        ai (str): The specification of the AI.
+        seed (int): The seed of the random moves.
+
+    Returns:
+        dict: The number of moves, the p50 and p99 latency in milliseconds and the moves per second.
+    """
+    latencies = []
+    remaining_games = list(range(games))
+    start = time.perf_counter()
+    await asyncio.gather(*[
+        client(host, port, remaining_games, ai, latencies, random.Random(seed + index))
+        for index in range(concurrency)
+    ])
+    elapsed = time.perf_counter() - start
+    latencies.sort()
+    return {
+        'moves': len(latencies),
+        'p50_ms': round(percentile(latencies, 0.5) * 1000, 2) if latencies else None,
+        'p99_ms': round(percentile(latencies, 0.99) * 1000, 2) if latencies else None,
+        'moves_per_second': round(len(latencies) / elapsed, 1),
+    }
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Generate load on the ConnectFour server.')
+    parser.add_argument('--host', default='127.0.0.1', help='address of the server')
+    parser.add_argument('--port', type=int, default=8765, help='port of the server')
+    parser.add_argument('--concurrency', type=int, default=10, help='number of connections at once')
+    parser.add_argument('--games', type=int, default=100, help='number of games in total')
+    parser.add_argument('--ai', default='solver:8', help='specification of the AI, as in simulate.py')
+    parser.add_argument('--seed', type=int, default=0, help='seed of the random moves')
+    args = parser.parse_args()
+
+    results = asyncio.run(run_load(args.host, args.port, args.concurrency, args.games, args.ai, args.seed))
+    print(f'{results["moves"]} moves at concurrency {args.concurrency}: p50 {results["p50_ms"]} ms, '
+          f'p99 {results["p99_ms"]} ms, {results["moves_per_second"]} moves/s')
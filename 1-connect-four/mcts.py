@@ -0,0 +1,255 @@
+"""
+The module contains a Monte Carlo Tree Search AI for the ConnectFour game from connect_four.py.
+It can be used in place of easyAI's Negamax, e.g. AI_Player(MCTS(time_budget=1000)),
+and works with every board size, e.g. ConnectFour(players, rows=7, columns=8, connect=5).
+
+The tree is searched with UCT selection. The random playouts run on a lightweight state
+(two bitboards and the column heights) using the precomputed winning lines of the board size,
+so the game is never copied. The search stops after the time budget or the number of playouts.
+With more than one worker, every worker process searches its own tree from the current position
+and the visit counts of the root moves are added up (root parallelization).
+
+After every search it reports the number of playouts and playouts per second.
+
+
+How to run
+---
+Run the benchmark with: python3 mcts.py
+"""
+import math
+import random
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from connect_four import board_tables
+
+
+class Node:
+    __slots__ = ('move', 'parent', 'children', 'untried', 'visits', 'wins', 'player', 'winner')
+
+    def __init__(self, move, parent, untried, player, winner):
+        """
+        Initialize a node of the search tree.
+
+        Args:
+            move (int): The move leading to the node.
+            parent (Node): The parent node, None for the root.
+            untried (list): The moves not expanded yet.
+            player (int): The ID of the player who made the move leading to the node.
+            winner (int): The ID of the player who won with that move, 0 if the game goes on, -1 for a draw.
+        """
+        self.move = move
+        self.parent = parent
+        self.children = []
+        self.untried = untried
+        self.visits = 0
+        self.wins = 0.0
+        self.player = player
+        self.winner = winner
+
+
+def play(bitboards, heights, player, column, tables):
+    """
+    Play a move on a lightweight state.
+
+    Args:
+        bitboards (list): The bitboards of player 1 and player 2, changed in place.
+        heights (list): The heights of the columns, changed in place.
+        player (int): The ID of the player making the move.
+        column (int): The column of the move.
+        tables (BoardTables): The precomputed tables of the board size.
+
+    Returns:
+        int: The ID of the player if the move wins, -1 if it fills the board, otherwise 0.
+    """
+    position = column * tables.column_height + heights[column]
+    bitboard = bitboards[player - 1] | (1 << position)
+    bitboards[player - 1] = bitboard
+    heights[column] += 1
+    for line in tables.cell_lines[position]:
+        if bitboard & line == line:
+            return player
+    if sum(heights) == tables.rows * tables.columns:
+        return -1
+    return 0
+
+
+def search_tree(bitboards, heights, player, size, time_budget, playouts, exploration, seed):
+    """
+    Run the Monte Carlo Tree Search from a position.
+
+    Args:
+        bitboards (list): The bitboards of player 1 and player 2.
+        heights (list): The heights of the columns.
+        player (int): The ID of the player to move.
+        size (tuple): The number of rows, columns and checkers in a row needed to win.
+        time_budget (float): The time of the search in seconds, or None.
+        playouts (int): The number of playouts, or None.
+        exploration (float): The exploration constant of UCT.
+        seed (int): The seed of the random number generator.
+
+    Returns:
+        tuple: A dictionary mapping every root move to its (visits, wins) and the number of playouts.
+    """
+    tables = board_tables(*size)
+    rng = random.Random(seed)
+    rows = tables.rows
+
+    def free_columns(state_heights):
+        return [col for col, height in enumerate(state_heights) if height < rows]
+
+    root = Node(None, None, free_columns(heights), 3 - player, 0)
+    deadline = None if time_budget is None else time.perf_counter() + time_budget
+    count = 0
+    while (playouts is None or count < playouts) and (deadline is None or time.perf_counter() < deadline):
+        count += 1
+        state_bitboards = list(bitboards)
+        state_heights = list(heights)
+        node = root
+
+        # Selection
+        while not node.untried and node.children:
+            log_visits = math.log(node.visits)
+            node = max(node.children, key=lambda child: child.wins / child.visits
+                       + exploration * math.sqrt(log_visits / child.visits))
+            play(state_bitboards, state_heights, node.player, node.move, tables)
+
+        # Expansion
+        winner = node.winner
+        if node.untried and not winner:
+            move = node.untried.pop(rng.randrange(len(node.untried)))
+            mover = 3 - node.player
+            winner = play(state_bitboards, state_heights, mover, move, tables)
+            child = Node(move, node, [] if winner else free_columns(state_heights), mover, winner)
+            node.children.append(child)
+            node = child
+
+        # Playout
+        mover = node.player
+        while not winner:
+            mover = 3 - mover
+            winner = play(state_bitboards, state_heights, mover, rng.choice(free_columns(state_heights)), tables)
+
+        # Backpropagation
+        while node is not None:
+            node.visits += 1
+            if winner == node.player:
+                node.wins += 1
+            elif winner == -1:
+                node.wins += 0.5
+            node = node.parent
+
+    return {child.move: (child.visits, child.wins) for child in root.children}, count
+
+
+class MCTS:
+    def __init__(self, time_budget=1000, playouts=None, workers=1, exploration=math.sqrt(2), seed=None):
+        """
+        Initialize the Monte Carlo Tree Search AI.
+
+        Args:
+            time_budget (int): The time for a move in milliseconds, or None to use only the number of playouts.
+            playouts (int): The number of playouts for a move (per worker), or None to use only the time budget.
+            workers (int): The number of worker processes searching at the same time.
+            exploration (float): The exploration constant of UCT.
+            seed (int): The seed of the random number generator.
+
+        Attributes:
+            - playouts_done (int): The number of playouts of the last search, of all the workers.
+            - elapsed (float): The duration of the last search in seconds.
+            - stats (dict): The visits and wins of every root move in the last search.
+
+        Raises:
+            ValueError: If neither the time budget nor the number of playouts is given.
+        """
+        if time_budget is None and playouts is None:
+            raise ValueError('Give the time budget or the number of playouts')
+        self.time_budget = time_budget
+        self.playouts = playouts
+        self.workers = workers
+        self.exploration = exploration
+        self.random = random.Random(seed)
+        self._pool = None
+        self.playouts_done = 0
+        self.elapsed = 0.0
+        self.stats = {}
+
+    @property
+    def pool(self):
+        """
+        The pool of the worker processes, started on the first search, or None for a single worker.
+        """
+        if self._pool is None and self.workers > 1:
+            self._pool = ProcessPoolExecutor(self.workers)
+        return self._pool
+
+    def __deepcopy__(self, memo):
+        """
+        Share the AI and its worker processes between the copies of a game, e.g. in easyAI's TwoPlayerGame.play().
+        """
+        return self
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        state['_pool'] = None
+        return state
+
+    def __call__(self, game):
+        """
+        Returns the AI's best move given the current state of the game.
+
+        Args:
+            game (ConnectFour): The game to search. It is not modified.
+
+        Returns:
+            int: The most visited column.
+        """
+        start = time.perf_counter()
+        args = (list(game.bitboards), list(game.heights), game.current_player, (game.rows, game.columns, game.connect),
+                None if self.time_budget is None else self.time_budget / 1000, self.playouts, self.exploration)
+        seeds = [self.random.randrange(2 ** 32) for _ in range(self.workers)]
+        if self.pool is None:
+            results = [search_tree(*args, seeds[0])]
+        else:
+            results = [future.result() for future in [self.pool.submit(search_tree, *args, seed) for seed in seeds]]
+
+        self.stats = {}
+        self.playouts_done = 0
+        for moves, count in results:
+            self.playouts_done += count
+            for move, (visits, wins) in moves.items():
+                total_visits, total_wins = self.stats.get(move, (0, 0.0))
+                self.stats[move] = (total_visits + visits, total_wins + wins)
+        self.elapsed = time.perf_counter() - start
+        if not self.stats:
+            return game.possible_moves()[0]
+        return max(self.stats, key=lambda move: self.stats[move][0])
+
+    @property
+    def playouts_per_second(self):
+        """
+        The search speed of the last search.
+        """
+        return self.playouts_done / self.elapsed if self.elapsed else 0.0
+
+    def close(self):
+        """
+        Stop the worker processes.
+        """
+        if self._pool is not None:
+            self._pool.shutdown()
+            self._pool = None
+
+
+if __name__ == '__main__':
+    import os
+    from connect_four import ConnectFour
+
+    for size in [(6, 7, 4), (7, 8, 5)]:
+        for workers in sorted({1, os.cpu_count()}):
+            ai = MCTS(time_budget=1000, workers=workers, seed=0)
+            game = ConnectFour([None, None], *size)
+            move = ai(game)
+            ai.close()
+            print(f'{size[0]}x{size[1]}, connect {size[2]}, {workers} workers: move {move}, '
+                  f'{ai.playouts_done} playouts in {ai.elapsed:.2f} s ({ai.playouts_per_second:.0f} playouts/s)')
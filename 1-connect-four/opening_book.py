@@ -0,0 +1,206 @@
+"""
+The module contains an opening book for the ConnectFour game from connect_four.py.
+
+The book generator searches every position up to the given number of plies with the Solver from solver.py
+and stores the best move of every position in a compact binary file.
+A position and its left/right mirror image share one entry.
+
+The file starts with a header (magic bytes b'C4BK', version, number of entries) followed by
+12-byte entries sorted by the key: key (uint64), score (int16), move (uint8), search depth (uint8).
+The file is loaded with mmap and searched with binary search, so loading is instant
+and the entries are read from the disk only when they are needed.
+
+
+How to run
+---
+Generate the book with: python3 opening_book.py --plies 4 --depth 12 --output opening_book.bin
+and use it with: Solver(12, book=OpeningBook('opening_book.bin'))
+"""
+import argparse
+import mmap
+import struct
+
+from solver import Solver, ordered_moves, has_four, BOTTOM_MASKS, COLUMN_MASKS
+from connect_four import COLUMNS, COLUMN_HEIGHT
+
+MAGIC = b'C4BK'
+VERSION = 1
+HEADER = struct.Struct('<4sHI')
+ENTRY = struct.Struct('<QhBB')
+KEY = struct.Struct('<Q')
+COLUMN_BITS = (1 << COLUMN_HEIGHT) - 1
+
+
+def position_key(current, mask):
+    """
+    Get the key of a position, the same as in the transposition table of the Solver.
+    It is unique, as adding the mask to the bitboard of the player sets a bit above every column.
+
+    Args:
+        current (int): The bitboard of the player to move.
+        mask (int): The bitboard of all checkers.
+
+    Returns:
+        int: The key of the position.
+    """
+    return current + mask
+
+
+def mirror(bitboard):
+    """
+    Mirror a bitboard left to right.
+
+    Args:
+        bitboard (int): The bitboard to mirror.
+
+    Returns:
+        int: The mirrored bitboard.
+    """
+    mirrored = 0
+    for col in range(COLUMNS):
+        mirrored |= ((bitboard >> (col * COLUMN_HEIGHT)) & COLUMN_BITS) << ((COLUMNS - 1 - col) * COLUMN_HEIGHT)
+    return mirrored
+
+
+def canonical_key(current, mask):
+    """
+    Get the key shared by a position and its mirror image.
+
+    Args:
+        current (int): The bitboard of the player to move.
+        mask (int): The bitboard of all checkers.
+
+    Returns:
+        tuple: The smaller of the two keys and True if it is the key of the mirror image.
+    """
+    key = position_key(current, mask)
+    mirrored_key = position_key(mirror(current), mirror(mask))
+    return (mirrored_key, True) if mirrored_key < key else (key, False)
+
+
+class OpeningBook:
+    def __init__(self, filename):
+        """
+        Open an opening book file.
+
+        Args:
+            filename (str): The path to the book file.
+
+        Raises:
+            ValueError: If the file is not an opening book.
+        """
+        self.filename = filename
+        with open(filename, 'rb') as file:
+            self.data = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, version, self.size = HEADER.unpack_from(self.data, 0)
+        if magic != MAGIC or version != VERSION:
+            raise ValueError(f'{filename} is not an opening book file')
+
+    def __len__(self):
+        return self.size
+
+    def __deepcopy__(self, memo):
+        """
+        Share the read-only book between the copies of a game, e.g. in easyAI's TwoPlayerGame.play().
+        """
+        return self
+
+    def __getstate__(self):
+        return {'filename': self.filename}
+
+    def __setstate__(self, state):
+        self.__init__(state['filename'])
+
+    def lookup(self, current, mask):
+        """
+        Find the best move of a position.
+
+        Args:
+            current (int): The bitboard of the player to move.
+            mask (int): The bitboard of all checkers.
+
+        Returns:
+            tuple: The best move, its score and the search depth, or None if the position is not in the book.
+        """
+        key, mirrored = canonical_key(current, mask)
+        low, high = 0, self.size
+        while low < high:
+            middle = (low + high) // 2
+            middle_key = KEY.unpack_from(self.data, HEADER.size + middle * ENTRY.size)[0]
+            if middle_key < key:
+                low = middle + 1
+            else:
+                high = middle
+        if low == self.size:
+            return None
+        entry_key, score, move, depth = ENTRY.unpack_from(self.data, HEADER.size + low * ENTRY.size)
+        if entry_key != key:
+            return None
+        return (COLUMNS - 1 - move if mirrored else move), score, depth
+
+    def close(self):
+        """
+        Close the book file.
+        """
+        self.data.close()
+
+
+def generate_book(filename, plies, depth):
+    """
+    Search every position up to the given number of plies and save the best moves to a book file.
+
+    Args:
+        filename (str): The path to the book file.
+        plies (int): The positions with up to this number of checkers are stored.
+        depth (int): The search depth of every position.
+
+    Returns:
+        int: The number of stored positions.
+    """
+    solver = Solver(depth)
+    entries = {}
+    # The positions with the given number of checkers, by the canonical key.
+    level = {canonical_key(0, 0)[0]: (0, 0)}
+    for moves in range(plies + 1):
+        next_level = {}
+        for key, (current, mask) in level.items():
+            move = solver.search(current, mask, moves)
+            entries[key] = (solver.score, canonical_move(current, mask, move), solver.depth_reached)
+            for col in ordered_moves(mask):
+                if has_four(current | ((mask + BOTTOM_MASKS[col]) & COLUMN_MASKS[col])):
+                    # The game ends with this move.
+                    continue
+                child = (current ^ mask, mask | (mask + BOTTOM_MASKS[col]))
+                next_level.setdefault(canonical_key(*child)[0], child)
+        level = next_level
+        print(f'{moves} plies: {len(entries)} positions')
+
+    with open(filename, 'wb') as file:
+        file.write(HEADER.pack(MAGIC, VERSION, len(entries)))
+        for key in sorted(entries):
+            file.write(ENTRY.pack(key, *entries[key]))
+    return len(entries)
+
+
+def canonical_move(current, mask, move):
+    """
+    Translate a move of a position to the orientation of its canonical key.
+
+    Args:
+        current (int): The bitboard of the player to move.
+        mask (int): The bitboard of all checkers.
+        move (int): The move in the position.
+
+    Returns:
+        int: The move in the canonical orientation.
+    """
+    return COLUMNS - 1 - move if canonical_key(current, mask)[1] else move
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Generate the ConnectFour opening book.')
+    parser.add_argument('--plies', type=int, default=4, help='store the positions with up to this many checkers')
+    parser.add_argument('--depth', type=int, default=12, help='search depth of every position')
+    parser.add_argument('--output', default='opening_book.bin', help='path to the book file')
+    args = parser.parse_args()
+    generate_book(args.output, args.plies, args.depth)
@@ -0,0 +1,170 @@
+"""
+The module contains a parallel version of the alpha-beta solver from solver.py.
+
+The moves of the root position are split across a pool of worker processes.
+Every worker keeps its own Solver with its own transposition table between the searches.
+The first root move is searched alone, then the other moves are searched at the same time
+with the window set by its score. The results are combined in the same move order as
+the serial search, which gives the same best move.
+
+
+How to run
+---
+Run the benchmark of the speedup for 1, 2, 4, ... workers with: python3 parallel_solver.py
+"""
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+from solver import Solver, ordered_moves, has_four, WIN_SCORE, BOTTOM_MASKS, COLUMN_MASKS, TT_SIZE
+
+_worker_solver = None
+
+
+def _init_worker(tt_size, scoring):
+    """
+    Create the Solver of a worker process.
+
+    Args:
+        tt_size (int): The number of slots of the transposition table.
+        scoring (function): The scoring function used at the depth limit, or None.
+    """
+    global _worker_solver
+    _worker_solver = Solver(tt_size=tt_size, scoring=scoring)
+
+
+def _search_move(current, mask, moves, depth, alpha, beta):
+    """
+    Score a position after a root move in a worker process.
+
+    Args:
+        current (int): The bitboard of the player to move after the root move.
+        mask (int): The bitboard of all checkers.
+        moves (int): The number of checkers on the board.
+        depth (int): The remaining depth.
+        alpha (int): The lower bound of the search window.
+        beta (int): The upper bound of the search window.
+
+    Returns:
+        tuple: The score for the player to move and the number of visited nodes.
+    """
+    _worker_solver.nodes = 0
+    value = _worker_solver.negamax(current, mask, moves, depth, alpha, beta)
+    return value, _worker_solver.nodes
+
+
+class ParallelSolver(Solver):
+    def __init__(self, depth=12, tt_size=TT_SIZE, scoring=None, workers=None):
+        """
+        Initialize the parallel solver. The worker processes are started on the first search.
+
+        Args:
+            depth (int): The maximum depth of the iterative deepening, in plies.
+            tt_size (int): The number of slots of the transposition table of every worker.
+            scoring (function): A function f(board, player) -> score used at the depth limit.
+                                It must be defined at the module level, so it can be sent to the workers.
+            workers (int): The number of worker processes, by default the number of CPUs.
+        """
+        super().__init__(depth, tt_size=1, scoring=scoring)
+        self.workers = workers or os.cpu_count()
+        self.tt_size = tt_size
+        self._pool = None
+
+    @property
+    def pool(self):
+        """
+        The pool of the worker processes, each with its own solver.
+        """
+        if self._pool is None:
+            self._pool = ProcessPoolExecutor(self.workers, initializer=_init_worker,
+                                             initargs=(self.tt_size, self.scoring))
+        return self._pool
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        state['_pool'] = None
+        return state
+
+    def search_root(self, current, mask, moves, depth, first_move=None):
+        """
+        Search all the moves of the root position to the given depth, one worker task per move.
+
+        The first move is searched with the full window. The other moves are searched in parallel
+        with the window above its score, so every move that beats it gets an exact score.
+
+        Args:
+            current (int): The bitboard of the player to move.
+            mask (int): The bitboard of all checkers.
+            moves (int): The number of checkers on the board.
+            depth (int): The depth of the search.
+            first_move (int): The move to search first, e.g. the best move of the previous iteration.
+
+        Returns:
+            tuple: The score of the best move and the best move.
+        """
+        self.nodes += 1
+        order = ordered_moves(mask, first_move)
+        for col in order:
+            if has_four(current | ((mask + BOTTOM_MASKS[col]) & COLUMN_MASKS[col])):
+                return WIN_SCORE - moves - 1, col
+
+        opponent = current ^ mask
+        value, nodes = self.pool.submit(
+            _search_move, opponent, mask | (mask + BOTTOM_MASKS[order[0]]), moves + 1, depth - 1, -WIN_SCORE, WIN_SCORE
+        ).result()
+        self.nodes += nodes
+        alpha = -value
+        futures = [
+            self.pool.submit(_search_move, opponent, mask | (mask + BOTTOM_MASKS[col]), moves + 1, depth - 1,
+                             -WIN_SCORE, -alpha)
+            for col in order[1:]
+        ]
+        best_value = alpha
+        best_move = order[0]
+        for col, future in zip(order[1:], futures):
+            value, nodes = future.result()
+            self.nodes += nodes
+            if -value > best_value:
+                best_value = -value
+                best_move = col
+        return best_value, best_move
+
+    def close(self):
+        """
+        Stop the worker processes.
+        """
+        if self._pool is not None:
+            self._pool.shutdown()
+            self._pool = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+
+if __name__ == '__main__':
+    from connect_four import ConnectFour
+
+    depth = 11
+    positions = {
+        'opening': [],
+        'midgame': [3, 3, 3, 3, 3, 3, 2, 4, 2, 2, 2, 2, 2, 4],
+    }
+    worker_counts = sorted({1, 2, 4, 8, 16, os.cpu_count()} & set(range(1, os.cpu_count() + 1)))
+    for name, moves in positions.items():
+        game = ConnectFour([None, None])
+        for move in moves:
+            game.play_move(move)
+
+        serial = Solver(depth)
+        serial_move = serial(game)
+        print(f'{name}, depth {depth}: serial move {serial_move} in {serial.elapsed:.2f} s')
+        for workers in worker_counts:
+            with ParallelSolver(depth, workers=workers) as solver:
+                # Start up the worker processes before the measurement.
+                list(solver.pool.map(abs, range(workers)))
+                move = solver(game)
+            print(f'  {workers:2d} workers: move {move} in {solver.elapsed:.2f} s, '
+                  f'speedup {serial.elapsed / solver.elapsed:.2f}x, {solver.nodes_per_second:.0f} nodes/s'
+                  f'{"" if move == serial_move else ", DIFFERENT MOVE"}')
@@ -0,0 +1,258 @@
+"""
+The module is an asyncio server holding many ConnectFour games against the AI at once.
+
+The clients connect over TCP and send one JSON object per line. The server answers every request
+with one JSON line. The AI searches run on a pool of worker processes, so a slow search
+of one game does not block the other games.
+
+Requests:
+- {"command": "new", "ai": "solver:10", "ai_first": false} - start a game. The AI is given as in simulate.py.
+- {"command": "move", "session": ID, "column": 3} - play a move, the AI answers with its move.
+- {"command": "close", "session": ID} - end a game.
+
+The games of a connection are ended when the connection is closed.
+
+Every answer about a game contains the session ID, the board (rows from the bottom), the AI move,
+the winner (0 if there is none yet) and whether the game is over. Errors are answered with {"error": MESSAGE}.
+
+
+How to run
+---
+Run the server with: python3 server.py --port 8765 --workers 4
+and the load generator with: python3 load_client.py --port 8765 --concurrency 50
+"""
+import argparse
+import asyncio
+import json
+import uuid
+from concurrent.futures import ProcessPoolExecutor
+
+from connect_four import ConnectFour
+from simulate import create_player, validate_spec
+
+_worker_players = {}
+
+
+def search_move(spec, bitboards, heights, current_player):
+    """
+    Find the AI move of a position in a worker process.
+
+    The AI of every specification is created once per worker, so its transposition table is reused.
+
+    Args:
+        spec (str): The specification of the AI, e.g. solver:10.
+        bitboards (list): The bitboards of the game.
+        heights (list): The heights of the columns.
+        current_player (int): The ID of the player to move.
+
+    Returns:
+        int: The column to play.
+    """
+    if spec not in _worker_players:
+        _worker_players[spec] = create_player(spec)
+    game = ConnectFour([None, None])
+    game.bitboards = list(bitboards)
+    game.heights = list(heights)
+    game.current_player = current_player
+    return _worker_players[spec](game)
+
+
+class Session:
+    def __init__(self, spec):
+        """
+        Initialize a game against the AI.
+
+        Args:
+            spec (str): The specification of the AI.
+
+        Attributes:
+            - game (ConnectFour): The game.
+            - lock (asyncio.Lock): Makes the requests of one game run one after another.
+        """
+        self.spec = spec
+        self.game = ConnectFour([None, None])
+        self.lock = asyncio.Lock()
+
+    def state(self, session_id, ai_move=None):
+        """
+        Describe the game for the client.
+
+        Args:
+            session_id (str): The ID of the session.
+            ai_move (int): The last AI move, if there was one.
+
+        Returns:
+            dict: The answer to the client.
+        """
+        return {
+            'session': session_id,
+            'board': self.game.board.tolist(),
+            'ai_move': ai_move,
+            'winner': self.game.winner,
+            'over': self.game.is_over(),
+        }
+
+
+class GameServer:
+    def __init__(self, workers=None):
+        """
+        Initialize the server.
+
+        Args:
+            workers (int): The number of worker processes for the AI searches, by default the number of CPUs.
+
+        Attributes:
+            - sessions (dict): The games by session ID.
+        """
+        self.pool = ProcessPoolExecutor(workers)
+        self.sessions = {}
+
+    async def ai_move(self, session):
+        """
+        Play the AI move of a game, searched in a worker process.
+
+        Args:
+            session (Session): The game.
+
+        Returns:
+            int: The AI move.
+
+        Raises:
+            ValueError: If the search failed. The game is not changed.
+        """
+        game = session.game
+        try:
+            move = await asyncio.get_running_loop().run_in_executor(
+                self.pool, search_move, session.spec, game.bitboards, game.heights, game.current_player
+            )
+        except Exception as e:
+            raise ValueError(f'The AI failed: {e.__class__.__name__}: {e}') from e
+        game.play_move(move)
+        return move
+
+    async def handle_request(self, request, owned=None):
+        """
+        Answer a single request.
+
+        Args:
+            request (dict): The request of the client.
+            owned (set): The session IDs of the connection, updated by the new and close commands.
+
+        Returns:
+            dict: The answer to the client.
+
+        Raises:
+            ValueError: If the request is not valid.
+        """
+        if not isinstance(request, dict):
+            raise ValueError('The request must be a JSON object')
+        command = request.get('command')
+        if command == 'new':
+            spec = request.get('ai', 'solver:10')
+            validate_spec(spec)
+            session_id = uuid.uuid4().hex
+            session = Session(spec)
+            self.sessions[session_id] = session
+            if owned is not None:
+                owned.add(session_id)
+            ai_move = None
+            if request.get('ai_first'):
+                async with session.lock:
+                    try:
+                        ai_move = await self.ai_move(session)
+                    except ValueError:
+                        del self.sessions[session_id]
+                        if owned is not None:
+                            owned.discard(session_id)
+                        raise
+            return session.state(session_id, ai_move)
+
+        session_id = request.get('session')
+        session = self.sessions.get(session_id)
+        if session is None:
+            raise ValueError(f'Unknown session: {session_id}')
+
+        if command == 'move':
+            async with session.lock:
+                column = request.get('column')
+                if session.game.is_over():
+                    raise ValueError('The game is over')
+                if type(column) is not int or column not in session.game.possible_moves():
+                    raise ValueError(f'Invalid move: {column}')
+                session.game.play_move(column)
+                ai_move = None
+                if not session.game.is_over():
+                    try:
+                        ai_move = await self.ai_move(session)
+                    except ValueError:
+                        session.game.switch_player()
+                        session.game.unmake_move(column)
+                        raise
+                return session.state(session_id, ai_move)
+
+        if command == 'close':
+            del self.sessions[session_id]
+            if owned is not None:
+                owned.discard(session_id)
+            return {'session': session_id, 'closed': True}
+
+        raise ValueError(f'Unknown command: {command}')
+
+    async def handle_client(self, reader, writer):
+        """
+        Serve a single client connection until it is closed, then end the games it started.
+
+        Args:
+            reader (asyncio.StreamReader): The stream of the requests.
+            writer (asyncio.StreamWriter): The stream of the answers.
+        """
+        owned = set()
+        try:
+            while line := await reader.readline():
+                try:
+                    answer = await self.handle_request(json.loads(line), owned)
+                except ValueError as e:
+                    answer = {'error': str(e)}
+                writer.write(json.dumps(answer).encode() + b'\n')
+                await writer.drain()
+        except ConnectionError:
+            pass
+        finally:
+            for session_id in owned:
+                self.sessions.pop(session_id, None)
+            writer.close()
+
+    async def serve(self, host, port):
+        """
+        Accept the client connections until the server is stopped.
+
+        Args:
+            host (str): The address to listen on.
+            port (int): The port to listen on.
+        """
+        server = await asyncio.start_server(self.handle_client, host, port)
+        print(f'Listening on {host}:{port}')
+        async with server:
+            await server.serve_forever()
+
+    def close(self):
+        """
+        Stop the worker processes.
+        """
+        self.pool.shutdown()
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Serve ConnectFour games against the AI.')
+    parser.add_argument('--host', default='127.0.0.1', help='address to listen on')
+    parser.add_argument('--port', type=int, default=8765, help='port to listen on')
+    parser.add_argument('--workers', type=int, default=None, help='number of worker processes for the AI')
+    args = parser.parse_args()
+
+    game_server = GameServer(args.workers)
+    try:
+        asyncio.run(game_server.serve(args.host, args.port))
+    except KeyboardInterrupt:
+        pass
+    finally:
+        game_server.close()
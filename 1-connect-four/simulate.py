@@ -0,0 +1,199 @@
+"""
+The module plays many ConnectFour games between two AI players without any user interaction.
+The games are played on a pool of worker processes and the result of every game is written
+as a JSON line as soon as the game ends: the moves, the winner, the time and the number of nodes of every move.
+
+The players are given as specifications:
+- solver:DEPTH - the Solver from solver.py, e.g. solver:12,
+- timed:MILLISECONDS - the Solver with a time budget, e.g. timed:200,
+- heuristic:DEPTH - the Solver scoring positions with window_score, e.g. heuristic:6,
+- negamax:DEPTH - easyAI's Negamax, e.g. negamax:6,
+- mcts:MILLISECONDS - the Monte Carlo Tree Search from mcts.py with a time budget, e.g. mcts:500,
+- random - a random move.
+
+The first moves of every game can be random, so the games between deterministic players differ.
+The players swap sides after every game.
+
+
+How to run
+---
+Run e.g. python3 simulate.py solver:10 heuristic:6 --games 100 --random-moves 2 --output results.jsonl
+"""
+import argparse
+import json
+import random
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from easyAI import Negamax
+
+from connect_four import ConnectFour, window_score
+from solver import Solver, MAX_MOVES
+from mcts import MCTS
+from evaluation_cache import EvaluationCache
+
+
+class RandomPlayer:
+    def __init__(self, seed=None):
+        """
+        Initialize a player choosing random moves.
+
+        Args:
+            seed (int): The seed of the random number generator.
+        """
+        self.random = random.Random(seed)
+
+    def __call__(self, game):
+        """
+        Returns a random possible move.
+        """
+        return self.random.choice(game.possible_moves())
+
+
+def validate_spec(spec):
+    """
+    Check the specification of an AI without creating it.
+
+    Args:
+        spec (str): The specification, as in create_player.
+
+    Raises:
+        ValueError: If the specification is not valid.
+    """
+    if not isinstance(spec, str):
+        raise ValueError(f'Unknown player: {spec}')
+    name, _, argument = spec.partition(':')
+    if name == 'random':
+        return
+    if name not in ('solver', 'timed', 'heuristic', 'negamax', 'mcts'):
+        raise ValueError(f'Unknown player: {spec}')
+    if int(argument) < 1:
+        raise ValueError(f'The depth or budget of the player must be at least 1: {spec}')
+
+
+def create_player(spec, seed=None, cache=None):
+    """
+    Create an AI from its specification.
+
+    Args:
+        spec (str): The specification, e.g. solver:12, timed:200, heuristic:6, negamax:6, mcts:500 or random.
+        seed (int): The seed of the random player.
+        cache (EvaluationCache): The persistent cache of the solver and timed players.
+
+    Returns:
+        callable: A function f(game) -> move.
+
+    Raises:
+        ValueError: If the specification is not valid.
+    """
+    name, _, argument = spec.partition(':')
+    if name == 'solver':
+        return Solver(int(argument), cache=cache)
+    if name == 'timed':
+        return Solver(MAX_MOVES, time_budget=int(argument), cache=cache)
+    if name == 'heuristic':
+        return Solver(int(argument), scoring=window_score)
+    if name == 'negamax':
+        return Negamax(int(argument))
+    if name == 'mcts':
+        return MCTS(time_budget=int(argument), seed=seed)
+    if name == 'random':
+        return RandomPlayer(seed)
+    raise ValueError(f'Unknown player: {spec}')
+
+
+def play_game(index, specs, random_moves, seed, cache_file=None):
+    """
+    Play a single game.
+
+    Args:
+        index (int): The number of the game.
+        specs (list): The specifications of the player 1 and player 2.
+        random_moves (int): The number of random moves at the beginning of the game.
+        seed (int): The seed of the random moves.
+        cache_file (str): The path to the persistent evaluation cache, or None.
+
+    Returns:
+        dict: The result of the game.
+    """
+    rng = random.Random(seed)
+    cache = EvaluationCache(cache_file) if cache_file else None
+    players = [create_player(spec, rng.randrange(2 ** 32), cache) for spec in specs]
+    game = ConnectFour([None, None])
+    moves = []
+    while not game.is_over():
+        if len(moves) < random_moves:
+            move = rng.choice(game.possible_moves())
+            latency, nodes = 0.0, None
+        else:
+            player = players[game.current_player - 1]
+            start = time.perf_counter()
+            move = player(game)
+            latency = time.perf_counter() - start
+            nodes = getattr(player, 'nodes', getattr(player, 'playouts_done', None))
+        moves.append({'player': game.current_player, 'column': move, 'ms': round(latency * 1000, 3), 'nodes': nodes})
+        game.play_move(move)
+    if cache is not None:
+        cache.close()
+    return {
+        'game': index,
+        'players': specs,
+        'winner': game.winner,
+        'winner_spec': specs[game.winner - 1] if game.winner else None,
+        'moves': moves,
+    }
+
+
+def simulate(specs, games, random_moves=0, workers=None, seed=0, cache_file=None):
+    """
+    Play the games on a pool of worker processes.
+
+    Args:
+        specs (list): The specifications of the two players. They swap sides after every game.
+        games (int): The number of games.
+        random_moves (int): The number of random moves at the beginning of every game.
+        workers (int): The number of worker processes, by default the number of CPUs.
+        seed (int): The seed of the random moves.
+        cache_file (str): The path to the persistent evaluation cache shared by all the games, or None.
+
+    Yields:
+        dict: The result of every game, in the order the games end.
+    """
+    with ProcessPoolExecutor(workers) as pool:
+        futures = [
+            pool.submit(play_game, index, specs if index % 2 == 0 else specs[::-1], random_moves, seed + index,
+                        cache_file)
+            for index in range(games)
+        ]
+        for future in as_completed(futures):
+            yield future.result()
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Play ConnectFour games between two AI players.')
+    parser.add_argument('players', nargs=2, help='the specifications of the players, e.g. solver:10 negamax:6')
+    parser.add_argument('--games', type=int, default=10, help='number of games')
+    parser.add_argument('--random-moves', type=int, default=0, help='number of random moves at the beginning')
+    parser.add_argument('--workers', type=int, default=None, help='number of worker processes')
+    parser.add_argument('--seed', type=int, default=0, help='seed of the random moves')
+    parser.add_argument('--cache', default=None, help='path to the persistent evaluation cache of the solvers')
+    parser.add_argument('--output', default=None, help='path to the JSON lines file, by default the standard output')
+    args = parser.parse_args()
+
+    for spec in args.players:
+        create_player(spec)
+    output = open(args.output, 'w') if args.output else sys.stdout
+    wins = {spec: 0 for spec in args.players}
+    draws = 0
+    for result in simulate(args.players, args.games, args.random_moves, args.workers, args.seed,
+                           args.cache):
+        output.write(json.dumps(result) + '\n')
+        output.flush()
+        if result['winner_spec']:
+            wins[result['winner_spec']] += 1
+        else:
+            draws += 1
+    if output is not sys.stdout:
+        output.close()
+    print(f'Wins: {wins}, draws: {draws}', file=sys.stderr)
@@ -0,0 +1,380 @@
+"""
+The module contains an alpha-beta solver for the ConnectFour game from connect_four.py.
+It can be used in place of easyAI's Negamax, e.g. AI_Player(Solver(12)).
+
+The solver searches directly on the bitboards of the game with:
+- center-first move ordering (the best move from the transposition table goes first),
+- a fixed-size transposition table keyed on the bitboards, with depth-preferred replacement,
+- iterative deepening up to the given depth or within a time budget.
+
+After every search it reports the reached depth, the number of nodes and nodes per second.
+
+
+How to run
+---
+Run the benchmark with: python3 solver.py
+"""
+import time
+
+from connect_four import ROWS, COLUMNS, CONNECT, COLUMN_HEIGHT, has_four, bitboards_to_array
+
+LOWERBOUND, EXACT, UPPERBOUND = -1, 0, 1
+MAX_MOVES = ROWS * COLUMNS
+# A win is scored WIN_SCORE minus the number of checkers on the board after the winning move,
+# so every score of at least WIN_SCORE - MAX_MOVES is a forced win and faster wins score higher.
+WIN_SCORE = 10000
+MOVE_ORDER = sorted(range(COLUMNS), key=lambda col: abs(COLUMNS // 2 - col))
+BOTTOM_MASKS = [1 << (col * COLUMN_HEIGHT) for col in range(COLUMNS)]
+TOP_MASKS = [1 << (col * COLUMN_HEIGHT + ROWS - 1) for col in range(COLUMNS)]
+COLUMN_MASKS = [((1 << ROWS) - 1) << (col * COLUMN_HEIGHT) for col in range(COLUMNS)]
+# The keys differ mostly in their high bits (the columns on the right), so the number of slots is a prime
+# and not a power of two, which would keep only the low bits of the key (the first three columns).
+TT_SIZE = 1048573
+
+
+def ordered_moves(mask, first_move=None):
+    """
+    Get the playable columns in the order they should be searched.
+
+    Args:
+        mask (int): The bitboard of all checkers.
+        first_move (int): The move to search first, the other moves go center-first.
+
+    Returns:
+        list: The playable columns.
+    """
+    order = MOVE_ORDER if first_move is None else [first_move] + [col for col in MOVE_ORDER if col != first_move]
+    return [col for col in order if not mask & TOP_MASKS[col]]
+
+
+class SearchTimeout(Exception):
+    """
+    Raised inside the search when the time budget is used up.
+    """
+
+
+class TranspositionTable:
+    def __init__(self, size=TT_SIZE):
+        """
+        Initialize a fixed-size transposition table.
+
+        Args:
+            size (int): The number of slots, best a prime. A position is stored in slot ``key % size``.
+
+        Attributes:
+            - entries (list): The slots, each None or a tuple (key, depth, flag, value, move).
+            - lookups (int): The number of lookups so far.
+            - hits (int): The number of lookups that found the position.
+        """
+        self.size = size
+        self.entries = [None] * size
+        self.lookups = 0
+        self.hits = 0
+
+    def lookup(self, key):
+        """
+        Find a position in the table.
+
+        Args:
+            key (int): The key of the position.
+
+        Returns:
+            tuple: The stored (key, depth, flag, value, move) entry, or None if the position is not stored.
+        """
+        self.lookups += 1
+        entry = self.entries[key % self.size]
+        if entry is not None and entry[0] == key:
+            self.hits += 1
+            return entry
+        return None
+
+    def store(self, key, depth, flag, value, move):
+        """
+        Store a position in the table.
+
+        An entry of another position is replaced only if it was searched to the same or lower depth,
+        so the expensive results near the root are kept.
+
+        Args:
+            key (int): The key of the position.
+            depth (int): The depth the position was searched to.
+            flag (int): EXACT, LOWERBOUND or UPPERBOUND.
+            value (int): The score of the position.
+            move (int): The best move found in the position.
+        """
+        index = key % self.size
+        entry = self.entries[index]
+        if entry is None or entry[0] == key or entry[1] <= depth:
+            self.entries[index] = (key, depth, flag, value, move)
+
+    @property
+    def hit_rate(self):
+        """
+        The fraction of lookups that found the position.
+        """
+        return self.hits / self.lookups if self.lookups else 0.0
+
+    def clear(self):
+        """
+        Remove all the entries and reset the counters.
+        """
+        self.entries = [None] * self.size
+        self.lookups = 0
+        self.hits = 0
+
+
+class Solver:
+    def __init__(self, depth=12, tt_size=TT_SIZE, scoring=None, time_budget=None, book=None, cache=None):
+        """
+        Initialize the solver.
+
+        Args:
+            depth (int): The maximum depth of the iterative deepening, in plies.
+            tt_size (int): The number of slots of the transposition table.
+            scoring (function): A function f(board, player) -> score used at the depth limit,
+                                e.g. connect_four.window_score. If not given, such positions score 0.
+            time_budget (int): The time for a move in milliseconds. When it is used up, the search stops
+                               and the best move of the last completed iteration is played.
+                               Use it with a large depth, e.g. Solver(42, time_budget=500).
+            book (OpeningBook): An opening book from opening_book.py. The positions found in it
+                                with at least the search depth, or with a proven score, are not searched.
+            cache (EvaluationCache): A persistent cache from evaluation_cache.py. The positions found in it
+                                     with at least the search depth are not searched, and the results are stored in it.
+                                     Solvers with different scoring functions should not share a cache.
+
+        Attributes:
+            - tt (TranspositionTable): The transposition table, kept between the searches.
+            - nodes (int): The number of nodes visited in the last search.
+            - depth_reached (int): The depth of the last completed iteration.
+            - depth_times (list): The time in seconds from the start of the last search to the end of every iteration.
+            - score (int): The score of the best move, positive if the AI wins, negative if it loses.
+            - elapsed (float): The duration of the last search in seconds.
+        """
+        self.depth = depth
+        self.tt = TranspositionTable(tt_size)
+        self.scoring = scoring
+        self.time_budget = time_budget
+        self.book = book
+        self.cache = cache
+        self.deadline = None
+        self.nodes = 0
+        self.depth_reached = 0
+        self.depth_times = []
+        self.score = 0
+        self.elapsed = 0.0
+
+    def __deepcopy__(self, memo):
+        """
+        Share the solver between the copies of a game instead of copying its transposition table.
+
+        easyAI's TwoPlayerGame.play() deep-copies the game, with its players, before every move.
+        """
+        return self
+
+    def __call__(self, game):
+        """
+        Returns the AI's best move given the current state of the game.
+
+        Args:
+            game (ConnectFour): The game to search. It is not modified.
+
+        Returns:
+            int: The column to play.
+
+        Raises:
+            ValueError: If the game is not played on the standard 6x7 board with four in a row.
+        """
+        if (game.rows, game.columns, game.connect) != (ROWS, COLUMNS, CONNECT):
+            raise ValueError('The solver supports only the standard 6x7 board with four in a row')
+        current = game.bitboards[game.current_player - 1]
+        mask = game.bitboards[0] | game.bitboards[1]
+        return self.search(current, mask, sum(game.heights))
+
+    @property
+    def nodes_per_second(self):
+        """
+        The search speed of the last search.
+        """
+        return self.nodes / self.elapsed if self.elapsed else 0.0
+
+    def search(self, current, mask, moves):
+        """
+        Find the best move with iterative deepening.
+
+        Args:
+            current (int): The bitboard of the player to move.
+            mask (int): The bitboard of all checkers.
+            moves (int): The number of checkers on the board.
+
+        Returns:
+            int: The column to play.
+        """
+        start = time.perf_counter()
+        self.deadline = None if self.time_budget is None else start + self.time_budget / 1000
+        self.nodes = 0
+        self.depth_reached = 0
+        self.depth_times = []
+        for store in (self.book, self.cache):
+            if store is None:
+                continue
+            stored = store.lookup(current, mask)
+            # A stored move is played only if it was searched at least as deep as this search would go,
+            # or its score is a proven win or loss.
+            if stored is not None and (stored[2] >= min(self.depth, MAX_MOVES - moves)
+                                       or abs(stored[1]) >= WIN_SCORE - MAX_MOVES):
+                best_move, self.score, self.depth_reached = stored
+                self.elapsed = time.perf_counter() - start
+                return best_move
+        best_move = next(col for col in MOVE_ORDER if not mask & TOP_MASKS[col])
+        try:
+            for depth in range(1, min(self.depth, MAX_MOVES - moves) + 1):
+                self.score, best_move = self.search_root(current, mask, moves, depth, best_move)
+                self.depth_reached = depth
+                self.depth_times.append(time.perf_counter() - start)
+                if abs(self.score) >= WIN_SCORE - MAX_MOVES:
+                    break
+        except SearchTimeout:
+            pass
+        if self.cache is not None and self.depth_reached:
+            self.cache.store(current, mask, best_move, self.score, self.depth_reached)
+        self.elapsed = time.perf_counter() - start
+        return best_move
+
+    def search_root(self, current, mask, moves, depth, first_move=None):
+        """
+        Search all the moves of the root position to the given depth.
+
+        Args:
+            current (int): The bitboard of the player to move.
+            mask (int): The bitboard of all checkers.
+            moves (int): The number of checkers on the board.
+            depth (int): The depth of the search.
+            first_move (int): The move to search first, e.g. the best move of the previous iteration.
+
+        Returns:
+            tuple: The score of the best move and the best move.
+        """
+        self.nodes += 1
+        order = ordered_moves(mask, first_move)
+        for col in order:
+            if has_four(current | ((mask + BOTTOM_MASKS[col]) & COLUMN_MASKS[col])):
+                return WIN_SCORE - moves - 1, col
+
+        alpha = -WIN_SCORE
+        best_move = order[0]
+        opponent = current ^ mask
+        for col in order:
+            value = -self.negamax(opponent, mask | (mask + BOTTOM_MASKS[col]), moves + 1, depth - 1, -WIN_SCORE, -alpha)
+            if value > alpha:
+                alpha = value
+                best_move = col
+        return alpha, best_move
+
+    def negamax(self, current, mask, moves, depth, alpha, beta):
+        """
+        Score a position with alpha-beta negamax.
+
+        A win is scored higher the sooner it happens, a position at the depth limit is scored with ``evaluate``.
+
+        Args:
+            current (int): The bitboard of the player to move.
+            mask (int): The bitboard of all checkers.
+            moves (int): The number of checkers on the board.
+            depth (int): The remaining depth.
+            alpha (int): The lower bound of the search window.
+            beta (int): The upper bound of the search window.
+
+        Returns:
+            int: The score of the position for the player to move.
+
+        Raises:
+            SearchTimeout: If the time budget is used up.
+        """
+        self.nodes += 1
+        if self.deadline is not None and self.nodes & 31 == 0 and time.perf_counter() > self.deadline:
+            raise SearchTimeout
+        for col in MOVE_ORDER:
+            if not mask & TOP_MASKS[col] and has_four(current | ((mask + BOTTOM_MASKS[col]) & COLUMN_MASKS[col])):
+                return WIN_SCORE - moves - 1
+        if moves == MAX_MOVES:
+            return 0
+        if depth == 0:
+            return self.evaluate(current, mask, moves)
+
+        alpha_orig = alpha
+        key = current + mask
+        entry = self.tt.lookup(key)
+        order = MOVE_ORDER
+        if entry is not None:
+            _, entry_depth, flag, value, move = entry
+            if entry_depth >= depth:
+                if flag == EXACT:
+                    return value
+                elif flag == LOWERBOUND:
+                    alpha = max(alpha, value)
+                elif flag == UPPERBOUND:
+                    beta = min(beta, value)
+                if alpha >= beta:
+                    return value
+            order = [move] + [col for col in MOVE_ORDER if col != move]
+
+        best_value = -WIN_SCORE - 1
+        best_move = None
+        opponent = current ^ mask
+        for col in order:
+            if mask & TOP_MASKS[col]:
+                continue
+            value = -self.negamax(opponent, mask | (mask + BOTTOM_MASKS[col]), moves + 1, depth - 1, -beta, -alpha)
+            if value > best_value:
+                best_value = value
+                best_move = col
+            if value > alpha:
+                alpha = value
+                if alpha >= beta:
+                    break
+
+        if best_value <= alpha_orig:
+            flag = UPPERBOUND
+        elif best_value >= beta:
+            flag = LOWERBOUND
+        else:
+            flag = EXACT
+        self.tt.store(key, depth, flag, best_value, best_move)
+        return best_value
+
+    def evaluate(self, current, mask, moves):
+        """
+        Score a position at the depth limit.
+
+        Args:
+            current (int): The bitboard of the player to move.
+            mask (int): The bitboard of all checkers.
+            moves (int): The number of checkers on the board.
+
+        Returns:
+            int: The score of the position for the player to move, 0 when nothing is known.
+        """
+        if self.scoring is None:
+            return 0
+        # The player to move is player 1 if an even number of checkers has been played.
+        player = 1 if moves % 2 == 0 else 2
+        bitboards = [current, current ^ mask] if player == 1 else [current ^ mask, current]
+        return self.scoring(bitboards_to_array(bitboards), player)
+
+
+if __name__ == '__main__':
+    from connect_four import ConnectFour
+
+    positions = {
+        'opening': [],
+        'midgame': [3, 3, 3, 3, 3, 3, 2, 4, 2, 2, 2, 2, 2, 4],
+    }
+    for name, moves in positions.items():
+        game = ConnectFour([None, None])
+        for move in moves:
+            game.play_move(move)
+        solver = Solver(12)
+        move = solver(game)
+        print(f'{name}: move {move}, score {solver.score}, depth {solver.depth_reached}, '
+              f'{solver.nodes} nodes in {solver.elapsed:.2f} s ({solver.nodes_per_second:.0f} nodes/s), '
+              f'TT hit rate {solver.tt.hit_rate:.1%}')
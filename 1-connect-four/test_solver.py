@@ -0,0 +1,29 @@
+"""
+The tests of the transposition table of solver.py.
+
+
+How to run
+---
+Run the tests with: python3 -m unittest test_solver
+"""
+import unittest
+
+from solver import Solver, TranspositionTable
+
+
+class TranspositionTableTest(unittest.TestCase):
+    def test_searched_positions_fill_many_slots(self):
+        solver = Solver(8)
+        solver.search(0, 0, 0)
+        filled = sum(entry is not None for entry in solver.tt.entries)
+        # The keys differing only in the columns 3-6 must not share a slot.
+        self.assertGreater(filled, 500)
+
+    def test_keys_differing_in_right_columns_use_different_slots(self):
+        table = TranspositionTable()
+        keys = [1 << shift for shift in range(21, 49)]
+        self.assertEqual(len({key % table.size for key in keys}), len(keys))
+
+
+if __name__ == '__main__':
+    unittest.main()
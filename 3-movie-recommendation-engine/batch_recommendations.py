@@ -0,0 +1,59 @@
+"""
+The program precomputes the movie recommendations of all the users at once.
+
+Every model is fitted once on all the ratings. The predicted ratings of every user and movie are computed
+with matrix operations (predict_all), and the top and bottom movies of every user are picked with a partial sort
+(recommend_all). The recommendations of both the Pearson and Cosine metrics are written to one CSV file.
+
+
+How to run
+---
+Run the program with the following command python3 batch_recommendations.py
+You can give the number of movies and the output file, e.g. python3 batch_recommendations.py --top 10 --output recommendations.csv
+"""
+import argparse
+import time
+
+import pandas as pd
+from surprise import Reader, Dataset, KNNBasic
+
+from movie_recommendation_engine import process_data, recommend_all, ensure_source, SOURCE_FILE
+
+
+def batch_recommendations(processed_data, n=5, metrics=('pearson', 'cosine')):
+    """
+    Fits a model per metric on all the ratings and provides the recommendations of every user.
+
+    Parameters:
+    processed_data (pandas.DataFrame): The ratings with columns ['Osoba', 'Nazwa', 'Ocena'].
+    n (int): The number of movies recommended and not recommended for every user.
+    metrics (tuple of str): The similarity metrics of the models.
+
+    Returns:
+    pandas.DataFrame: The recommendations of recommend_all with an extra 'Metryka' column.
+    """
+    data = Dataset.load_from_df(processed_data[['Osoba', 'Nazwa', 'Ocena']], Reader(rating_scale=(1, 10)))
+    trainset = data.build_full_trainset()
+
+    frames = []
+    for metric in metrics:
+        model = KNNBasic(sim_options={'name': metric, 'user_based': True}, verbose=False)
+        model.fit(trainset)
+        recommendations = recommend_all(model, n)
+        recommendations.insert(0, 'Metryka', metric)
+        frames.append(recommendations)
+    return pd.concat(frames, ignore_index=True)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Precompute the movie recommendations of all the users.')
+    parser.add_argument('--input', default=SOURCE_FILE, help='saved ratings or Excel file with the survey')
+    parser.add_argument('--output', default='recommendations.csv', help='CSV file for the recommendations')
+    parser.add_argument('--top', type=int, default=5, help='number of movies recommended and not recommended')
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    results = batch_recommendations(process_data(ensure_source(args.input)), args.top)
+    results.to_csv(args.output, index=False)
+    print(f'{results["Osoba"].nunique()} użytkowników, {len(results)} rekomendacji zapisanych do {args.output} '
+          f'w {time.perf_counter() - start:.2f} s')
@@ -0,0 +1,69 @@
+"""
+The program compares the load times of the ratings saved in the formats of ratings_store.py
+with the reading and processing of the Excel survey sheet (process_data) on a large synthetic survey.
+It checks that all the formats give the same ratings table.
+The Parquet and Feather formats are skipped if pyarrow is not installed.
+
+
+How to run
+---
+Run the program with the following command python3 benchmark_load.py
+You can give the number of respondents and movies per respondent, e.g. python3 benchmark_load.py 5000 31
+"""
+import os
+import sys
+import tempfile
+import time
+
+import pandas as pd
+
+from benchmark_process_data import make_survey
+from movie_recommendation_engine import process_data
+from ratings_store import save_ratings, load_ratings
+
+
+def timed(function, *args, repeat=3):
+    """
+    Runs a function a few times and measures the best time.
+
+    Parameters:
+    function (callable): The function to run.
+    args: The arguments of the function.
+    repeat (int): The number of runs.
+
+    Returns:
+    tuple: The result of the last run and the best time in seconds.
+    """
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = function(*args)
+        best = min(best, time.perf_counter() - start)
+    return result, best
+
+
+if __name__ == '__main__':
+    respondents = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+    pairs = int(sys.argv[2]) if len(sys.argv) > 2 else 31
+    survey = make_survey(respondents, pairs)
+    survey = survey.mask(survey == 0)
+
+    with tempfile.TemporaryDirectory() as directory:
+        excel_file = os.path.join(directory, 'parsed_data.xlsx')
+        survey.to_excel(excel_file, index=False)
+        expected, excel_time = timed(process_data, excel_file, repeat=1)
+        print(f'{respondents} respondents x {pairs} movies, {len(expected)} ratings')
+        print(f'{"xlsx":>8}: {excel_time:.3f} s, {os.path.getsize(excel_file) / 1e6:.1f} MB')
+
+        for extension in ('.ratings', '.parquet', '.feather'):
+            path = os.path.join(directory, 'parsed_data' + extension)
+            try:
+                save_ratings(expected, path)
+            except ImportError as e:
+                print(f'{extension[1:]:>8}: skipped ({e.__class__.__name__}: pyarrow is needed)')
+                continue
+            result, load_time = timed(load_ratings, path)
+            pd.testing.assert_frame_equal(result, expected, check_dtype=False)
+            size = sum(os.path.getsize(os.path.join(path, name)) for name in os.listdir(path)) if os.path.isdir(path) \
+                else os.path.getsize(path)
+            print(f'{extension[1:]:>8}: {load_time:.3f} s, {size / 1e6:.1f} MB ({excel_time / load_time:.0f}x faster)')
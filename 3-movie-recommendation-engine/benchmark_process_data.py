@@ -0,0 +1,64 @@
+"""
+The program compares the speed of the vectorized reshaping of the survey sheet (reshape_ratings)
+with the original loop over the rows (reshape_ratings_iterrows) on a large synthetic sheet.
+It checks that both give the same ratings table.
+
+
+How to run
+---
+Run the program with the following command python3 benchmark_process_data.py
+You can give the number of respondents and movies per respondent, e.g. python3 benchmark_process_data.py 10000 31
+"""
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+from movie_recommendation_engine import reshape_ratings, reshape_ratings_iterrows
+
+
+def make_survey(respondents, pairs, movies=2000, seed=0):
+    """
+    Generates a synthetic survey sheet in the format of parsed_data.xlsx, with about 10% of the answers missing.
+
+    Parameters:
+    respondents (int): The number of rows.
+    pairs (int): The number of Nazwa/Ocena column pairs.
+    movies (int): The number of different movie titles.
+    seed (int): The seed of the random number generator.
+
+    Returns:
+    pandas.DataFrame: The sheet with missing values filled with 0, as in process_data.
+    """
+    rng = np.random.default_rng(seed)
+    columns = {'Osoba': [f'Osoba {i}' for i in range(respondents)]}
+    for pair in range(pairs):
+        suffix = f'.{pair}' if pair else ''
+        titles = rng.integers(0, movies, respondents).astype(str).astype(object)
+        ratings = rng.integers(1, 11, respondents).astype(float)
+        missing = rng.random(respondents) < 0.1
+        titles[missing] = np.nan
+        ratings[missing] = np.nan
+        columns['Nazwa' + suffix] = ['Film ' + title if isinstance(title, str) else title for title in titles]
+        columns['Ocena' + suffix] = ratings
+    return pd.DataFrame(columns).fillna(0)
+
+
+if __name__ == '__main__':
+    respondents = int(sys.argv[1]) if len(sys.argv) > 1 else 5000
+    pairs = int(sys.argv[2]) if len(sys.argv) > 2 else 31
+    df = make_survey(respondents, pairs)
+
+    start = time.perf_counter()
+    expected = reshape_ratings_iterrows(df)
+    loop_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    result = reshape_ratings(df)
+    vectorized_time = time.perf_counter() - start
+
+    pd.testing.assert_frame_equal(result, expected, check_dtype=False)
+    print(f'{respondents} respondents x {pairs} movies, {len(result)} ratings')
+    print(f'iterrows loop: {loop_time:.3f} s')
+    print(f'vectorized:    {vectorized_time:.3f} s ({loop_time / vectorized_time:.0f}x faster)')
@@ -1,5 +1,33 @@
+"""
+The program replaces the movie names in the survey sheet with their official titles from the IMDb search API.
+
+The cleaning pipeline (clean_dataframe) first collects the unique movie names of all the 'Nazwa' columns.
+It resolves them concurrently, with a bounded number of requests at once and retries with backoff,
+and saves the resolved titles to a checkpoint file as it goes, so a rerun after a crash skips the names already done.
+At the end the titles are put into all the columns with one replace.
+
+
+How to run
+---
+Run the program with the following command python3 data_cleaner.py
+You can give the files and the number of requests at once, e.g. python3 data_cleaner.py data.xlsx parsed_data.ratings --workers 16
+The cleaned ratings are saved in the binary format of ratings_store.py, or as the survey sheet if the output is an .xlsx file.
+"""
+import argparse
+import json
+import os
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
 import pandas as pd
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+from movie_recommendation_engine import reshape_ratings
+from ratings_store import save_ratings, is_excel
+
+API_URL = 'https://search.imdbot.workers.dev/'
+CHECKPOINT_FILE = 'titles_checkpoint.json'
 
 
 def fetch_movie_title(movie_name):
@@ -17,7 +45,7 @@ def fetch_movie_title(movie_name):
     Requests.RequestException: If there is an error while making the API request.
     """
     try:
-        response = requests.get('https://search.imdbot.workers.dev/', params={'q': movie_name})
+        response = requests.get(API_URL, params={'q': movie_name})
         response.raise_for_status()
         data = response.json()
         if '#TITLE' in data['description'][0]:
@@ -34,6 +62,7 @@ def process_dataframe(df):
     """
     Processes a DataFrame by updating movie names with their official titles.
 
+    It is the original serial implementation, clean_dataframe does the same concurrently and can be resumed.
     The function iterates through each column in the DataFrame that starts with 'Nazwa'.
     For each movie name, it fetches the official title and updates the DataFrame accordingly.
 
@@ -56,7 +85,224 @@ def process_dataframe(df):
                     df.at[idx, column] = processed_titles[value]
 
 
+def unique_titles(df):
+    """
+    Collects the unique movie names of all the columns that start with 'Nazwa'.
+
+    Parameters:
+    df (pandas.DataFrame): The survey sheet.
+
+    Returns:
+    list: The movie names (only strings), in the order of their first appearance.
+    """
+    names = df[[column for column in df.columns if column.startswith('Nazwa')]].to_numpy().ravel(order='F')
+    return [name for name in pd.unique(names) if isinstance(name, str)]
+
+
+def create_session(workers=8, retries=3, backoff=0.5):
+    """
+    Creates an HTTP session that reuses the connections and retries the failed requests.
+
+    Parameters:
+    workers (int): The number of connections kept open.
+    retries (int): The number of retries of a request that failed or was answered with a server error.
+    backoff (float): The backoff factor, the waits between the retries are backoff, 2 * backoff, 4 * backoff, ... seconds.
+
+    Returns:
+    requests.Session: The session.
+    """
+    session = requests.Session()
+    retry = Retry(total=retries, backoff_factor=backoff, status_forcelist=[429, 500, 502, 503, 504],
+                  allowed_methods=['GET'])
+    adapter = HTTPAdapter(pool_connections=1, pool_maxsize=workers, max_retries=retry)
+    session.mount('http://', adapter)
+    session.mount('https://', adapter)
+    return session
+
+
+def resolve_title(session, movie_name, url=API_URL, timeout=10):
+    """
+    Fetches the official title of a movie over the given session.
+
+    Parameters:
+    session (requests.Session): The session of the requests.
+    movie_name (str): The name of the movie.
+    url (str): The address of the API.
+    timeout (float): The timeout of a request in seconds.
+
+    Returns:
+    str: The official title, or None if the API does not know the movie.
+
+    Raises:
+    requests.RequestException: If the request failed after all the retries.
+    ValueError: If the answer is not in the format of the API.
+    """
+    response = session.get(url, params={'q': movie_name}, timeout=timeout)
+    response.raise_for_status()
+    body = response.json()
+    if not isinstance(body, dict):
+        raise ValueError(f'Nieprawidłowa odpowiedź API: {body!r:.100}')
+    descriptions = body.get('description')
+    if descriptions and isinstance(descriptions, list) and isinstance(descriptions[0], dict) \
+            and '#TITLE' in descriptions[0]:
+        return descriptions[0]['#TITLE']
+    return None
+
+
+def load_checkpoint(filename):
+    """
+    Loads the titles resolved before from the checkpoint file.
+
+    Parameters:
+    filename (str): The path to the checkpoint file.
+
+    Returns:
+    dict: The official title of every movie name resolved before, None for the names the API does not know.
+    """
+    if not os.path.isfile(filename):
+        return {}
+    with open(filename, encoding='utf-8') as file:
+        return json.load(file)
+
+
+def save_checkpoint(filename, titles):
+    """
+    Saves the resolved titles to the checkpoint file.
+
+    The file is written under a temporary name and then renamed, so a crash never leaves a broken checkpoint.
+
+    Parameters:
+    filename (str): The path to the checkpoint file.
+    titles (dict): The resolved titles.
+    """
+    temporary = f'{filename}.tmp'
+    with open(temporary, 'w', encoding='utf-8') as file:
+        json.dump(titles, file, ensure_ascii=False)
+    os.replace(temporary, filename)
+
+
+def resolve_titles(movie_names, checkpoint_file=CHECKPOINT_FILE, workers=8, retries=3, backoff=0.5, url=API_URL,
+                   checkpoint_interval=50):
+    """
+    Resolves the official titles of many movies concurrently, saving the progress to the checkpoint file.
+
+    The names already in the checkpoint are not fetched again. The names whose requests failed after all the retries
+    are left out of the checkpoint, so they are tried again on the next run.
+
+    Parameters:
+    movie_names (list of str): The movie names.
+    checkpoint_file (str): The path to the checkpoint file, or None to keep the progress only in memory.
+    workers (int): The maximum number of requests at once.
+    retries (int): The number of retries of a failed request.
+    backoff (float): The backoff factor of the retries.
+    url (str): The address of the API.
+    checkpoint_interval (int): The number of resolved names between the saves of the checkpoint.
+
+    Returns:
+    dict: The official title of every resolved movie name, None for the names the API does not know.
+    """
+    titles = load_checkpoint(checkpoint_file) if checkpoint_file else {}
+    pending = [name for name in movie_names if name not in titles]
+    if not pending:
+        return titles
+
+    session = create_session(workers, retries, backoff)
+    resolved = 0
+    try:
+        with ThreadPoolExecutor(workers) as pool:
+            futures = {pool.submit(resolve_title, session, name, url): name for name in pending}
+            for future in as_completed(futures):
+                name = futures[future]
+                try:
+                    titles[name] = future.result()
+                except (requests.RequestException, ValueError) as e:
+                    print(f"Błąd podczas zapytania do API dla filmu '{name}': {e}")
+                    continue
+                if titles[name] is None:
+                    print(f"Brak danych '#TITLE' dla filmu: {name}")
+                resolved += 1
+                if checkpoint_file and resolved % checkpoint_interval == 0:
+                    save_checkpoint(checkpoint_file, titles)
+    finally:
+        if checkpoint_file:
+            save_checkpoint(checkpoint_file, titles)
+        session.close()
+    return titles
+
+
+def apply_titles(df, titles):
+    """
+    Replaces the movie names in all the 'Nazwa' columns with their official titles, with one vectorized replace.
+
+    Parameters:
+    df (pandas.DataFrame): The survey sheet.
+    titles (dict): The official title of every movie name, None for the names to keep.
+
+    Returns:
+    pandas.DataFrame: A copy of the sheet with the official titles.
+    """
+    columns = [column for column in df.columns if column.startswith('Nazwa')]
+    mapping = {name: title for name, title in titles.items() if title}
+    df = df.copy()
+    df[columns] = df[columns].replace(mapping)
+    return df
+
+
+def clean_dataframe(df, checkpoint_file=CHECKPOINT_FILE, workers=8, retries=3, backoff=0.5, url=API_URL):
+    """
+    Runs the cleaning pipeline: collects the unique movie names, resolves them and puts the official titles into the sheet.
+
+    Parameters:
+    df (pandas.DataFrame): The survey sheet.
+    checkpoint_file (str): The path to the checkpoint file, or None to keep the progress only in memory.
+    workers (int): The maximum number of requests at once.
+    retries (int): The number of retries of a failed request.
+    backoff (float): The backoff factor of the retries.
+    url (str): The address of the API.
+
+    Returns:
+    pandas.DataFrame: A copy of the sheet with the official titles.
+    """
+    titles = resolve_titles(unique_titles(df), checkpoint_file, workers, retries, backoff, url)
+    return apply_titles(df, titles)
+
+
+def sheet_to_ratings(df):
+    """
+    Transforms the cleaned survey sheet to the ratings table saved by ratings_store.py.
+
+    The ratings that are not numbers (e.g. the answers Excel turned into dates) are skipped.
+
+    Parameters:
+    df (pandas.DataFrame): The survey sheet.
+
+    Returns:
+    pandas.DataFrame: A DataFrame with columns ['Osoba', 'Nazwa', 'Ocena'].
+    """
+    df = df.copy()
+    columns = [column for column in df.columns if column.startswith('Ocena')]
+    numeric = df[columns].apply(pd.to_numeric, errors='coerce')
+    invalid = int((numeric.isna() & df[columns].notna()).to_numpy().sum())
+    if invalid:
+        print(f'Pominięto {invalid} ocen, które nie są liczbami')
+    df[columns] = numeric
+    return reshape_ratings(df.fillna(0))
+
+
 if __name__ == '__main__':
-    df = pd.read_excel('data.xlsx')
-    process_dataframe(df)
-    df.to_excel('parsed_data.xlsx')
+    parser = argparse.ArgumentParser(description='Replace the movie names of the survey with their official titles.')
+    parser.add_argument('input', nargs='?', default='data.xlsx', help='Excel file with the survey')
+    parser.add_argument('output', nargs='?', default='parsed_data.ratings',
+                        help='file for the cleaned ratings (.ratings, .parquet, .feather) or the cleaned survey (.xlsx)')
+    parser.add_argument('--checkpoint', default=CHECKPOINT_FILE, help='file of the titles resolved so far')
+    parser.add_argument('--workers', type=int, default=8, help='maximum number of requests at once')
+    parser.add_argument('--retries', type=int, default=3, help='number of retries of a failed request')
+    parser.add_argument('--url', default=API_URL, help='address of the movie information API')
+    args = parser.parse_args()
+
+    df = pd.read_excel(args.input)
+    df = clean_dataframe(df, args.checkpoint, args.workers, args.retries, url=args.url)
+    if is_excel(args.output):
+        df.to_excel(args.output, index=False)
+    else:
+        save_ratings(sheet_to_ratings(df), args.output)
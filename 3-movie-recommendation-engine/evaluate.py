@@ -0,0 +1,213 @@
+"""
+The program is an evaluation harness of the recommenders, separate from the recommendation queries.
+
+It runs k-fold cross-validation of every configuration (e.g. the Pearson and Cosine KNNBasic models), with the folds
+of all the configurations fitted in parallel on a pool of processes. For every configuration it reports:
+- the RMSE of the predicted ratings of the test fold,
+- precision@k: the part of the top k movies of a user in the test fold (by predicted rating) predicted as good
+  (at least --threshold) that the user really rated as good, averaged over the users,
+- the fit and predict times.
+The report is printed as a table and can be saved as JSON, so the model can be chosen by both quality and speed.
+
+A new algorithm is evaluated by adding it to CONFIGURATIONS: a class with fit(processed_data, test_size=None)
+and predict(pairs) methods, like MovieRecommender, and the keyword arguments of the class.
+
+
+How to run
+---
+Run the evaluation with: python3 evaluate.py
+Choose the configurations and folds with e.g.: python3 evaluate.py --configurations knn-pearson sparse-pearson --folds 10
+Save the report with: python3 evaluate.py --output evaluation.json
+"""
+import argparse
+import json
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+from movie_recommendation_engine import MovieRecommender, process_data, ensure_source, SOURCE_FILE
+from sparse_recommender import SparseRecommender
+
+# name: (recommender class, keyword arguments)
+CONFIGURATIONS = {
+    'knn-pearson': (MovieRecommender, {'metric': 'pearson'}),
+    'knn-cosine': (MovieRecommender, {'metric': 'cosine'}),
+    'sparse-pearson': (SparseRecommender, {'metric': 'pearson'}),
+    'sparse-cosine': (SparseRecommender, {'metric': 'cosine'}),
+}
+
+_worker_data = None
+
+
+def init_worker(processed_data):
+    """
+    Keeps the ratings in a worker process, so they are sent to every worker once and not with every fold.
+
+    Parameters:
+    processed_data (pandas.DataFrame): The ratings with columns ['Osoba', 'Nazwa', 'Ocena'].
+    """
+    global _worker_data
+    _worker_data = processed_data
+
+
+def make_folds(n_ratings, folds, seed=0):
+    """
+    Assigns the ratings to the folds at random, with fold sizes differing by at most one.
+
+    Parameters:
+    n_ratings (int): The number of ratings.
+    folds (int): The number of folds.
+    seed (int): The seed of the random number generator.
+
+    Returns:
+    numpy.ndarray: The fold of every rating.
+    """
+    assignment = np.empty(n_ratings, dtype=int)
+    assignment[np.random.default_rng(seed).permutation(n_ratings)] = np.arange(n_ratings) % folds
+    return assignment
+
+
+def precision_at_k(test, predictions, k=5, threshold=7):
+    """
+    Computes precision@k of the predictions of a test fold.
+
+    For every user the k movies with the highest predicted ratings are taken. The precision of the user is the part
+    of those predicted as good (at least the threshold) that the user rated as good. The users with no movie
+    predicted as good have a precision of 0.
+
+    Parameters:
+    test (pandas.DataFrame): The test ratings with columns ['Osoba', 'Nazwa', 'Ocena'].
+    predictions (numpy.ndarray): The predicted ratings of the test ratings.
+    k (int): The number of top movies of a user.
+    threshold (float): The lowest good rating.
+
+    Returns:
+    float: The precision averaged over the users.
+    """
+    frame = pd.DataFrame({'Osoba': test['Osoba'].to_numpy(), 'true': test['Ocena'].to_numpy(dtype=float),
+                          'estimate': predictions})
+    frame = frame.sort_values(['Osoba', 'estimate'], ascending=[True, False], kind='stable')
+    top = frame[frame.groupby('Osoba', sort=False).cumcount() < k]
+    recommended = top['estimate'] >= threshold
+    relevant = recommended & (top['true'] >= threshold)
+    counts = pd.DataFrame({'recommended': recommended, 'relevant': relevant}).groupby(top['Osoba']).sum()
+    precision = np.where(counts['recommended'] > 0, counts['relevant'] / counts['recommended'].replace(0, 1), 0.0)
+    return float(precision.mean()) if len(precision) else 0.0
+
+
+def evaluate_fold(name, fold, assignment, k=5, threshold=7):
+    """
+    Fits a configuration on all the folds but one and evaluates it on that fold, in a worker process.
+
+    Parameters:
+    name (str): The name of the configuration in CONFIGURATIONS.
+    fold (int): The test fold.
+    assignment (numpy.ndarray): The fold of every rating.
+    k (int): The k of precision@k.
+    threshold (float): The lowest good rating of precision@k.
+
+    Returns:
+    dict: The RMSE, precision@k and the fit and predict times in seconds.
+    """
+    recommender_class, kwargs = CONFIGURATIONS[name]
+    train = _worker_data[assignment != fold].reset_index(drop=True)
+    test = _worker_data[assignment == fold].reset_index(drop=True)
+
+    start = time.perf_counter()
+    recommender = recommender_class(**kwargs).fit(train, test_size=None)
+    fit_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    predictions = recommender.predict(test)
+    predict_time = time.perf_counter() - start
+
+    errors = predictions - test['Ocena'].to_numpy(dtype=float)
+    return {
+        'fold': fold,
+        'rmse': float(np.sqrt(np.mean(errors ** 2))),
+        'precision_at_k': precision_at_k(test, predictions, k, threshold),
+        'fit_time': fit_time,
+        'predict_time': predict_time,
+        'predictions_per_second': len(test) / predict_time if predict_time else None,
+    }
+
+
+def cross_validate(processed_data, names, folds=5, k=5, threshold=7, workers=None, seed=0):
+    """
+    Runs k-fold cross-validation of the configurations, with all the folds in parallel.
+
+    Parameters:
+    processed_data (pandas.DataFrame): The ratings with columns ['Osoba', 'Nazwa', 'Ocena'].
+    names (list of str): The names of the configurations in CONFIGURATIONS.
+    folds (int): The number of folds.
+    k (int): The k of precision@k.
+    threshold (float): The lowest good rating of precision@k.
+    workers (int): The number of worker processes, by default the number of CPUs.
+    seed (int): The seed of the split into the folds, the same for all the configurations.
+
+    Returns:
+    dict: The settings and, for every configuration, the mean and standard deviation of every metric
+    and the results of every fold.
+    """
+    assignment = make_folds(len(processed_data), folds, seed)
+    with ProcessPoolExecutor(workers, initializer=init_worker, initargs=(processed_data,)) as pool:
+        futures = {(name, fold): pool.submit(evaluate_fold, name, fold, assignment, k, threshold)
+                   for name in names for fold in range(folds)}
+        results = {key: future.result() for key, future in futures.items()}
+
+    report = {
+        'ratings': len(processed_data),
+        'users': int(processed_data['Osoba'].nunique()),
+        'movies': int(processed_data['Nazwa'].nunique()),
+        'folds': folds,
+        'k': k,
+        'threshold': threshold,
+        'seed': seed,
+        'configurations': {},
+    }
+    for name in names:
+        fold_results = [results[name, fold] for fold in range(folds)]
+        summary = {}
+        for metric in ('rmse', 'precision_at_k', 'fit_time', 'predict_time'):
+            values = np.array([result[metric] for result in fold_results])
+            summary[metric] = {'mean': float(values.mean()), 'std': float(values.std())}
+        report['configurations'][name] = {
+            'class': CONFIGURATIONS[name][0].__name__,
+            'parameters': CONFIGURATIONS[name][1],
+            'summary': summary,
+            'folds': fold_results,
+        }
+    return report
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Cross-validate the movie recommenders.')
+    parser.add_argument('--input', default=SOURCE_FILE, help='saved ratings or Excel file with the survey')
+    parser.add_argument('--configurations', nargs='+', choices=list(CONFIGURATIONS), default=list(CONFIGURATIONS),
+                        help='configurations to evaluate')
+    parser.add_argument('--folds', type=int, default=5, help='number of folds')
+    parser.add_argument('--k', type=int, default=5, help='number of top movies of precision@k')
+    parser.add_argument('--threshold', type=float, default=7, help='lowest good rating of precision@k')
+    parser.add_argument('--workers', type=int, default=None, help='number of worker processes')
+    parser.add_argument('--seed', type=int, default=0, help='seed of the split into the folds')
+    parser.add_argument('--output', default=None, help='save the report to this JSON file')
+    args = parser.parse_args()
+
+    ratings = process_data(ensure_source(args.input))
+    start = time.perf_counter()
+    evaluation = cross_validate(ratings, args.configurations, args.folds, args.k, args.threshold, args.workers, args.seed)
+    elapsed = time.perf_counter() - start
+
+    print(f'{evaluation["ratings"]} ratings, {args.folds} folds, {os.cpu_count()} CPUs, {elapsed:.2f} s')
+    print(f'{"configuration":<16} {"RMSE":>14} {"precision@" + str(args.k):>14} {"fit [s]":>10} {"predict [s]":>12}')
+    for name, result in evaluation['configurations'].items():
+        summary = result['summary']
+        print(f'{name:<16} {summary["rmse"]["mean"]:>7.4f} ±{summary["rmse"]["std"]:.3f} '
+              f'{summary["precision_at_k"]["mean"]:>7.4f} ±{summary["precision_at_k"]["std"]:.3f} '
+              f'{summary["fit_time"]["mean"]:>10.4f} {summary["predict_time"]["mean"]:>12.4f}')
+    if args.output:
+        with open(args.output, 'w') as file:
+            json.dump(evaluation, file, indent=2)
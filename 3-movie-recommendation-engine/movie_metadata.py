@@ -0,0 +1,193 @@
+"""
+The module fetches movie information from the IMDb search API for many movies at once.
+
+The movies are looked up concurrently on a thread pool, over one requests.Session, so the connections are reused.
+The answers are kept in a cache on disk (an SQLite database) for the given time to live,
+so the titles looked up before are not fetched again on the next runs.
+Showing the recommendations costs about one round-trip of latency instead of one per movie.
+
+
+How to run
+---
+Compare the serial and concurrent lookups on the local stub server with: python3 movie_metadata.py
+Use it with: MetadataClient(cache=MetadataCache('metadata_cache.db')).fetch_many(['Inception', 'Se7en'])
+"""
+import json
+import sqlite3
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+from requests.adapters import HTTPAdapter
+
+API_URL = 'https://search.imdbot.workers.dev/'
+
+
+class MetadataCache:
+    def __init__(self, filename, ttl=7 * 24 * 3600):
+        """
+        Opens the cache, creating the database file if it does not exist.
+
+        Parameters:
+        filename (str): The path to the database file.
+        ttl (float): The time in seconds after which an entry is fetched again.
+        """
+        self.filename = filename
+        self.ttl = ttl
+        self.lock = threading.Lock()
+        self.connection = sqlite3.connect(filename, timeout=30, isolation_level=None, check_same_thread=False)
+        self.connection.execute('PRAGMA journal_mode=WAL')
+        self.connection.execute('''
+            CREATE TABLE IF NOT EXISTS movies (
+                query TEXT PRIMARY KEY,
+                description TEXT NOT NULL,
+                fetched REAL NOT NULL
+            )
+        ''')
+
+    def get(self, query):
+        """
+        Finds the description of a movie fetched less than the time to live ago.
+
+        Parameters:
+        query (str): The movie name sent to the API.
+
+        Returns:
+        dict: The description of the movie, or None if it is not in the cache or has expired.
+        """
+        with self.lock:
+            row = self.connection.execute('SELECT description, fetched FROM movies WHERE query = ?', (query,)).fetchone()
+        if row is None or time.time() - row[1] > self.ttl:
+            return None
+        return json.loads(row[0])
+
+    def set(self, query, description):
+        """
+        Stores the description of a movie.
+
+        Parameters:
+        query (str): The movie name sent to the API.
+        description (dict): The first description of the API answer.
+        """
+        with self.lock:
+            self.connection.execute('INSERT OR REPLACE INTO movies (query, description, fetched) VALUES (?, ?, ?)',
+                                    (query, json.dumps(description), time.time()))
+
+    def close(self):
+        self.connection.close()
+
+
+def movie_info(description):
+    """
+    Picks the year, actors and IMDB URL from a movie description.
+
+    Parameters:
+    description (dict): The description of the API answer, or None.
+
+    Returns:
+    tuple: Movie year, actors, and IMDB URL, or None if any of them is missing.
+    """
+    if description and '#YEAR' in description and '#ACTORS' in description and '#IMDB_URL' in description:
+        return description['#YEAR'], description['#ACTORS'], description['#IMDB_URL']
+    return None
+
+
+class MetadataClient:
+    def __init__(self, url=API_URL, cache=None, workers=8, timeout=10):
+        """
+        Initializes the client of the IMDb search API.
+
+        Parameters:
+        url (str): The address of the API.
+        cache (MetadataCache): The cache of the answers, or None to always fetch.
+        workers (int): The number of requests sent at once.
+        timeout (float): The timeout of a request in seconds.
+        """
+        self.url = url
+        self.cache = cache
+        self.workers = workers
+        self.timeout = timeout
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=workers)
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+        self.pool = ThreadPoolExecutor(workers)
+        self.requests_sent = 0
+
+    def fetch(self, query):
+        """
+        Fetches the description of a movie, from the cache if it is there.
+
+        Parameters:
+        query (str): The movie name.
+
+        Returns:
+        dict: The first description of the API answer, or None if the request failed or the movie was not found.
+        """
+        if self.cache is not None:
+            description = self.cache.get(query)
+            if description is not None:
+                return description
+        try:
+            self.requests_sent += 1
+            response = self.session.get(self.url, params={'q': query}, timeout=self.timeout)
+            response.raise_for_status()
+            body = response.json()
+            if not isinstance(body, dict):
+                raise ValueError(f'Nieprawidłowa odpowiedź API: {body!r:.100}')
+            descriptions = body.get('description')
+        except (requests.RequestException, ValueError) as e:
+            print(f"Błąd podczas zapytania do API dla filmu '{query}': {e}")
+            return None
+        if not descriptions or not isinstance(descriptions, list) or not isinstance(descriptions[0], dict):
+            print(f"Brak danych dla filmu: {query}")
+            return None
+        if self.cache is not None:
+            self.cache.set(query, descriptions[0])
+        return descriptions[0]
+
+    def fetch_many(self, queries):
+        """
+        Fetches the descriptions of many movies at once. Every movie is fetched only once.
+
+        Parameters:
+        queries (iterable of str): The movie names.
+
+        Returns:
+        dict: The description of every movie name, None if it could not be fetched.
+        """
+        unique = list(dict.fromkeys(queries))
+        return dict(zip(unique, self.pool.map(self.fetch, unique)))
+
+    def close(self):
+        """
+        Stops the thread pool and closes the connections.
+        """
+        self.pool.shutdown()
+        self.session.close()
+
+
+if __name__ == '__main__':
+    import tempfile
+    import os
+    from stub_metadata_server import start_stub_server
+
+    server = start_stub_server(delay=0.1)
+    url = f'http://127.0.0.1:{server.server_address[1]}/'
+    movies = [f'Film {i}' for i in range(20)]
+
+    start = time.perf_counter()
+    for movie in movies:
+        requests.get(url, params={'q': movie}).json()
+    print(f'{len(movies)} movies one by one: {time.perf_counter() - start:.2f} s')
+
+    with tempfile.TemporaryDirectory() as directory:
+        client = MetadataClient(url, MetadataCache(os.path.join(directory, 'metadata_cache.db')), workers=len(movies))
+        for run in ('concurrent', 'cached'):
+            start = time.perf_counter()
+            descriptions = client.fetch_many(movies)
+            print(f'{len(movies)} movies {run}: {time.perf_counter() - start:.2f} s, {client.requests_sent} requests in total')
+        client.close()
+        client.cache.close()
+    server.shutdown()
@@ -16,20 +16,38 @@ How to run
 Run the program with the following command python3 movie_recommendation_engine.py
 You will be asked to provide a user for whom the recommendations are to be generated.
 Please type in user name exactly as it is in the Excel file.
+The ratings are read from parsed_data.ratings (see ratings_store.py), imported from parsed_data.xlsx on the first run.
 The program will print top 5 movie recommendations and 5 movies not recommended with both the Pearson and Cosine metrics.
+The users can also be given as arguments, e.g. python3 movie_recommendation_engine.py "Adam Łuszcz" --top 10
+
+The module can be imported without side effects. Use the MovieRecommender class in other programs, e.g.
+recommender = MovieRecommender('pearson').fit(process_data(SOURCE_FILE)) and recommender.recommend(user, 5).
 
 
 Authors: Adam Łuszcz, Anna Rogala
 """
+import numpy as np
 import pandas as pd
+from scipy import sparse
 from surprise import Reader, Dataset
 from surprise.model_selection import train_test_split
 from surprise import KNNBasic
 from surprise import accuracy
 import requests
+import argparse
+import hashlib
 import os
+import pickle
+
+from movie_metadata import MetadataClient, MetadataCache, movie_info, API_URL
+from ratings_store import load_ratings, save_ratings, is_excel, recover_numpy
+from sparse_recommender import SparseRecommender, SimilarityTerms, chunk_similarities
 
-SOURCE_FILE = 'parsed_data.xlsx'
+SOURCE_FILE = 'parsed_data.ratings'
+EXCEL_SOURCE_FILE = 'parsed_data.xlsx'
+MODEL_FILE = 'models.pkl'
+MODEL_FORMAT = 3
+METADATA_CACHE_FILE = 'metadata_cache.db'
 
 
 def process_data(filename):
@@ -37,9 +55,10 @@ def process_data(filename):
     Reads and processes an Excel file to format suitable for the Surprise library.
 
     The function reads from an Excel file, handles missing values, and transforms the data into a format where each row represents a user, a movie, and a rating.
+    The ratings saved before in a binary format (.ratings, .parquet or .feather, see ratings_store.py) are loaded directly.
 
     Parameters:
-    filename (str): The path to the Excel file containing user ratings.
+    filename (str): The path to the Excel file containing user ratings, or to the saved ratings.
 
     Returns:
     pandas.DataFrame: A DataFrame with columns ['Osoba', 'Nazwa', 'Ocena'] representing user, movie, and rating respectively.
@@ -48,6 +67,9 @@ def process_data(filename):
     FileNotFoundError: If the specified file does not exist.
     Exception: For errors encountered while reading the Excel file.
     """
+    if not is_excel(filename):
+        return load_ratings(filename)
+
     if not os.path.isfile(filename):
         raise FileNotFoundError(f"Nie znaleziono pliku: {filename}")
 
@@ -58,6 +80,44 @@ def process_data(filename):
 
     df.fillna(0, inplace=True)
 
+    return reshape_ratings(df)
+
+
+def reshape_ratings(df):
+    """
+    Transforms the survey sheet to a format where each row represents a user, a movie, and a rating.
+
+    The paired Nazwa/Ocena columns are reshaped at once with NumPy, without a Python loop over the rows.
+    The rows are in the same order as in the sheet, and the pairs with an empty movie or rating are skipped.
+
+    Parameters:
+    df (pandas.DataFrame): The survey sheet with the 'Osoba' column followed by pairs of movie and rating columns,
+    with missing values filled with 0.
+
+    Returns:
+    pandas.DataFrame: A DataFrame with columns ['Osoba', 'Nazwa', 'Ocena'] representing user, movie, and rating respectively.
+    """
+    pairs = (df.shape[1] - 1) // 2
+    movies = df.iloc[:, 1:1 + 2 * pairs:2].to_numpy().ravel()
+    ratings = df.iloc[:, 2:2 + 2 * pairs:2].to_numpy().ravel()
+    users = np.repeat(df['Osoba'].astype(str).to_numpy(), pairs)
+
+    keep = pd.notna(movies) & (movies != 0) & (movies != '') & pd.notna(ratings) & (ratings != 0)
+    return pd.DataFrame({'Osoba': users[keep], 'Nazwa': movies[keep], 'Ocena': ratings[keep]})
+
+
+def reshape_ratings_iterrows(df):
+    """
+    Transforms the survey sheet like reshape_ratings, but with a Python loop over the rows.
+
+    It is the original implementation, kept as a reference for the benchmark.
+
+    Parameters:
+    df (pandas.DataFrame): The survey sheet with missing values filled with 0.
+
+    Returns:
+    pandas.DataFrame: A DataFrame with columns ['Osoba', 'Nazwa', 'Ocena'] representing user, movie, and rating respectively.
+    """
     data_list = []
     for index, row in df.iterrows():
         user = str(row['Osoba'])
@@ -70,34 +130,520 @@ def process_data(filename):
     return pd.DataFrame(data_list, columns=['Osoba', 'Nazwa', 'Ocena'])
 
 
-def get_movie_recommendations(model, trainset, testset, user):
+def file_hash(filename):
+    """
+    Computes the SHA-256 hash of the content of a file, or of all the files of a directory.
+
+    Parameters:
+    filename (str): The path to the file or directory.
+
+    Returns:
+    str: The hexadecimal digest of the content.
+    """
+    digest = hashlib.sha256()
+    if os.path.isdir(filename):
+        paths = [os.path.join(filename, name) for name in sorted(os.listdir(filename))]
+    else:
+        paths = [filename]
+    for path in paths:
+        digest.update(os.path.basename(path).encode())
+        with open(path, 'rb') as file:
+            for block in iter(lambda: file.read(1024 * 1024), b''):
+                digest.update(block)
+    return digest.hexdigest()
+
+
+def ensure_source(source_file=SOURCE_FILE, excel_file=EXCEL_SOURCE_FILE):
+    """
+    Imports the Excel file to the binary ratings file if the ratings file does not exist yet
+    or is older than the Excel file, e.g. after the survey was cleaned again with data_cleaner.py.
+
+    Parameters:
+    source_file (str): The path to the ratings file.
+    excel_file (str): The path to the Excel file imported when the ratings file is missing or older.
+
+    Returns:
+    str: The path to the ratings file.
+    """
+    recover_numpy(source_file)
+    if is_excel(source_file) or not os.path.isfile(excel_file):
+        return source_file
+    if not os.path.exists(source_file) or os.path.getmtime(excel_file) > os.path.getmtime(source_file):
+        save_ratings(process_data(excel_file), source_file)
+        print(f'Zaimportowano oceny z {excel_file} do {source_file}')
+    return source_file
+
+
+def train_models(processed_data, backend='dense'):
+    """
+    Fits a recommender with the Pearson and one with the Cosine metric on all the ratings.
+    The models are evaluated separately, by evaluate.py, so no ratings are held out for a test dataset.
+
+    Parameters:
+    processed_data (pandas.DataFrame): The ratings with columns ['Osoba', 'Nazwa', 'Ocena'].
+    backend (str): 'dense' for MovieRecommender (Surprise) or 'sparse' for SparseRecommender (sparse_recommender.py).
+
+    Returns:
+    dict: The fitted recommenders by metric name.
+
+    Raises:
+    ValueError: If the backend is not supported.
+    """
+    if backend == 'dense':
+        recommender_class = MovieRecommender
+    elif backend == 'sparse':
+        recommender_class = SparseRecommender
+    else:
+        raise ValueError(f'Nieobsługiwany backend: {backend}')
+    return {metric: recommender_class(metric).fit(processed_data, test_size=None) for metric in ('pearson', 'cosine')}
+
+
+def save_models(filename, artifact):
+    """
+    Saves the fitted models and the processed ratings to disk.
+
+    The file is written under a temporary name and then renamed, so a broken file is never left behind.
+
+    Parameters:
+    filename (str): The path to the model file.
+    artifact (dict): The source hash, the processed ratings and the fitted recommenders.
+    """
+    temporary = f'{filename}.{os.getpid()}.tmp'
+    with open(temporary, 'wb') as file:
+        pickle.dump(artifact, file, protocol=pickle.HIGHEST_PROTOCOL)
+    os.replace(temporary, filename)
+
+
+def load_models(filename, source_hash, backend='dense'):
     """
-    Trains a recommendation model and provides movie recommendations for a specific user.
+    Loads the fitted models saved by save_models, if they were trained on the same source file.
+
+    Parameters:
+    filename (str): The path to the model file.
+    source_hash (str): The hash of the current source file.
+    backend (str): The backend the models must have been trained with.
+
+    Returns:
+    dict: The saved artifact, or None if the file does not exist, cannot be read, has an old format or was made from other data.
+    """
+    if not os.path.isfile(filename):
+        return None
+    try:
+        with open(filename, 'rb') as file:
+            artifact = pickle.load(file)
+    except Exception as e:
+        print(f"Nie udało się wczytać modeli z pliku {filename}: {e}")
+        return None
+    if not isinstance(artifact, dict) or artifact.get('format') != MODEL_FORMAT:
+        return None
+    if artifact.get('source_hash') != source_hash or artifact.get('backend', 'dense') != backend:
+        return None
+    return artifact
+
+
+def load_or_train(source_file=SOURCE_FILE, model_file=MODEL_FILE, backend='dense'):
+    """
+    Loads the fitted models from the model file, or trains and saves them when the source file has changed.
+
+    Parameters:
+    source_file (str): The path to the Excel file or the saved ratings.
+    model_file (str): The path to the model file, or None to always train without saving.
+    backend (str): 'dense' or 'sparse', as in train_models.
+
+    Returns:
+    dict: The artifact with keys 'source_hash', 'processed_data' and 'models' (the MovieRecommender objects by metric).
+
+    Raises:
+    FileNotFoundError: If the source file does not exist.
+    """
+    if not os.path.exists(source_file):
+        raise FileNotFoundError(f"Nie znaleziono pliku: {source_file}")
+
+    source_hash = file_hash(source_file)
+    artifact = load_models(model_file, source_hash, backend) if model_file else None
+    if artifact is not None:
+        return artifact
+
+    processed_data = process_data(source_file)
+    artifact = {
+        'format': MODEL_FORMAT,
+        'source_hash': source_hash,
+        'backend': backend,
+        'processed_data': processed_data,
+        'models': train_models(processed_data, backend),
+    }
+    if model_file:
+        save_models(model_file, artifact)
+    return artifact
+
+
+def merge_ratings(processed_data, new_ratings):
+    """
+    Puts new ratings into the ratings table. A rating of a movie the user has already rated replaces the old one.
+
+    Parameters:
+    processed_data (pandas.DataFrame): The ratings with columns ['Osoba', 'Nazwa', 'Ocena'].
+    new_ratings (pandas.DataFrame): The new ratings with the same columns.
+
+    Returns:
+    pandas.DataFrame: The changed ratings followed by the added ones.
+    """
+    new_ratings = new_ratings[['Osoba', 'Nazwa', 'Ocena']].drop_duplicates(['Osoba', 'Nazwa'], keep='last')
+    keys = pd.MultiIndex.from_frame(processed_data[['Osoba', 'Nazwa']])
+    new_keys = pd.MultiIndex.from_frame(new_ratings[['Osoba', 'Nazwa']])
+    positions = new_keys.get_indexer(keys)
+    changed = positions >= 0
+
+    merged = processed_data.copy()
+    merged.loc[changed, 'Ocena'] = new_ratings['Ocena'].to_numpy()[positions[changed]]
+    return pd.concat([merged, new_ratings[~new_keys.isin(keys)]], ignore_index=True)
+
+
+def add_ratings(new_ratings, source_file=SOURCE_FILE, model_file=MODEL_FILE, backend='dense'):
+    """
+    Adds ratings to the ratings file and updates the fitted models without training them again.
+
+    Parameters:
+    new_ratings (pandas.DataFrame): The new ratings with columns ['Osoba', 'Nazwa', 'Ocena'].
+    source_file (str): The path to the ratings file, it is overwritten with all the ratings.
+    model_file (str): The path to the model file, or None to not save the updated models.
+    backend (str): 'dense' or 'sparse', as in train_models.
+
+    Returns:
+    dict: The updated artifact, as returned by load_or_train.
+    """
+    artifact = load_or_train(source_file, model_file, backend)
+    artifact['processed_data'] = merge_ratings(artifact['processed_data'], new_ratings)
+    for recommender in artifact['models'].values():
+        recommender.update(new_ratings)
+
+    save_ratings(artifact['processed_data'], source_file)
+    artifact['source_hash'] = file_hash(source_file)
+    if model_file:
+        save_models(model_file, artifact)
+    return artifact
+
+
+def rating_matrix(trainset):
+    """
+    Builds the dense user x movie rating matrix of a Surprise trainset.
 
     Parameters:
-    model (surprise.prediction_algorithms): The recommendation model to be trained.
     trainset (Trainset): The training dataset.
-    testset (list of (uid, iid, r_ui) tuples): The test dataset.
-    user (str): The user for whom the recommendations are to be generated.
 
     Returns:
-    tuple: Two lists of tuples, each containing movie names and predicted ratings. The first list is top recommendations, and the second is movies not recommended.
+    tuple: The ratings (numpy.ndarray, 0 where a movie is not rated) and the mask of the rated movies (numpy.ndarray of bool),
+    both indexed by the inner user and movie ids.
     """
-    model.fit(trainset)
-    predictions = model.test(testset)
-    accuracy.rmse(predictions)
+    ratings = np.zeros((trainset.n_users, trainset.n_items))
+    rated = np.zeros((trainset.n_users, trainset.n_items), dtype=bool)
+    for user, user_ratings in trainset.ur.items():
+        if user_ratings:
+            movies, values = zip(*user_ratings)
+            ratings[user, list(movies)] = values
+            rated[user, list(movies)] = True
+    return ratings, rated
 
-    rated_movies = set(processed_data[processed_data['Osoba'] == user]['Nazwa'])
 
-    recommendations = []
-    for movie_id in processed_data['Nazwa'].unique():
-        if movie_id not in rated_movies:
-            predicted_rating = model.predict(selected_user, movie_id).est
-            recommendations.append((movie_id, predicted_rating))
+def predict_all(model, chunk_size=None):
+    """
+    Predicts the ratings of all users for all movies with a fitted user-based KNNBasic model.
 
-    top_recommendations = sorted(recommendations, key=lambda x: x[1], reverse=True)[:5]
-    do_not_watch = sorted(recommendations, key=lambda x: x[1])[:5]
-    return top_recommendations, do_not_watch
+    The predictions are the same as model.predict gives for every pair, but they are computed with matrix operations
+    on the similarity and rating matrices instead of a Python call per pair.
+    If every movie has at most k raters, all the raters are neighbours and the whole matrix is two matrix products.
+    Otherwise the k most similar raters of every movie are selected with a stable sort, a chunk of users at a time.
+    The predictions of the movies a user has already rated are not meaningful, as the user is their own neighbour.
+
+    Parameters:
+    model (surprise.KNNBasic): The user-based model, already fitted.
+    chunk_size (int): The number of users scored at once when the neighbours are limited to k, by default chosen to keep
+    the chunk under about 64 MB.
+
+    Returns:
+    tuple: The predicted ratings (numpy.ndarray of users x movies) and the mask of the rated movies, indexed by inner ids.
+    """
+    trainset = model.trainset
+    ratings, rated = rating_matrix(trainset)
+    similarities = np.asarray(model.sim, dtype=float)
+    n_users = trainset.n_users
+    lower_bound, higher_bound = trainset.rating_scale
+
+    if model.k >= rated.sum(axis=0).max():
+        weights = np.where(similarities > 0, similarities, 0.0)
+        weighted_sum = weights @ ratings
+        weight_total = weights @ rated
+        neighbours = (weights > 0).astype(float) @ rated
+    else:
+        # The raters of every movie in the order of trainset.ir, so the ties are broken like in heapq.nlargest
+        positions = np.repeat(np.arange(n_users)[:, None] + n_users, trainset.n_items, axis=1)
+        for movie, movie_ratings in trainset.ir.items():
+            positions[[user for user, _ in movie_ratings], movie] = np.arange(len(movie_ratings))
+        raters = np.argsort(positions, axis=0)
+        movie_columns = np.arange(trainset.n_items)
+        if chunk_size is None:
+            chunk_size = max(1, 8 * 1024 * 1024 // max(1, n_users * trainset.n_items))
+        weighted_sum = np.zeros_like(ratings)
+        weight_total = np.zeros_like(ratings)
+        neighbours = np.zeros_like(ratings)
+        for start in range(0, n_users, chunk_size):
+            rows = slice(start, start + chunk_size)
+            candidates = np.where(rated[raters, movie_columns][None], similarities[rows][:, raters], -np.inf)
+            nearest = np.argsort(-candidates, axis=1, kind='stable')[:, :model.k]
+            nearest_similarities = np.take_along_axis(candidates, nearest, axis=1)
+            nearest_ratings = ratings[raters[nearest, movie_columns], movie_columns]
+            weights = np.where(nearest_similarities > 0, nearest_similarities, 0.0)
+            weighted_sum[rows] = (weights * nearest_ratings).sum(axis=1)
+            weight_total[rows] = weights.sum(axis=1)
+            neighbours[rows] = (weights > 0).sum(axis=1)
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        predictions = weighted_sum / weight_total
+    predictions = np.where(neighbours >= model.min_k, predictions, trainset.global_mean)
+    return np.clip(predictions, lower_bound, higher_bound), rated
+
+
+def recommend_all(model, n=5):
+    """
+    Provides the top and bottom movie recommendations for every user at once.
+
+    The movies already rated by a user are skipped. The n best and n worst movies are picked with np.partition,
+    so only the picked movies are sorted. The ties are broken by the order of the movies in the trainset,
+    which for a trainset built from all the ratings is the order of processed_data['Nazwa'].unique(),
+    so the recommendations are the same as those of MovieRecommender.recommend.
+
+    Parameters:
+    model (surprise.KNNBasic): The user-based model, already fitted.
+    n (int): The number of movies recommended and not recommended for every user.
+
+    Returns:
+    pandas.DataFrame: A DataFrame with columns ['Osoba', 'Lista', 'Pozycja', 'Nazwa', 'Ocena'], where 'Lista' is 'top'
+    for the recommendations and 'bottom' for the movies not recommended.
+    """
+    trainset = model.trainset
+    predictions, rated = predict_all(model)
+    n = min(n, trainset.n_items)
+    users = np.array([trainset.to_raw_uid(user) for user in range(trainset.n_users)], dtype=object)
+    movies = np.array([trainset.to_raw_iid(movie) for movie in range(trainset.n_items)], dtype=object)
+    rows = np.arange(trainset.n_users)[:, None]
+
+    frames = []
+    for label, scores in (('top', np.where(rated, -np.inf, predictions)),
+                          ('bottom', np.where(rated, -np.inf, -predictions))):
+        kth = -np.partition(-scores, n - 1, axis=1)[:, n - 1:n]
+        tied = scores == kth
+        needed = n - (scores > kth).sum(axis=1, keepdims=True)
+        chosen = (scores > kth) | (tied & (np.cumsum(tied, axis=1) <= needed))
+        picked = np.nonzero(chosen)[1].reshape(trainset.n_users, n)
+        picked = np.take_along_axis(picked, np.argsort(-scores[rows, picked], axis=1, kind='stable'), axis=1)
+        valid = ~rated[rows, picked]
+        frames.append(pd.DataFrame({
+            'Osoba': np.repeat(users, n)[valid.ravel()],
+            'Lista': label,
+            'Pozycja': np.tile(np.arange(1, n + 1), trainset.n_users)[valid.ravel()],
+            'Nazwa': movies[picked][valid],
+            'Ocena': predictions[rows, picked][valid],
+        }))
+    return pd.concat(frames, ignore_index=True).sort_values(['Osoba', 'Lista', 'Pozycja'], ascending=[True, False, True],
+                                                             kind='stable', ignore_index=True)
+
+
+class MovieRecommender:
+    def __init__(self, metric='pearson', k=40, rating_scale=(1, 10)):
+        """
+        Initializes a user-based KNNBasic recommender. Nothing is read or trained until fit is called.
+
+        Parameters:
+        metric (str): The similarity metric between users, 'pearson' or 'cosine'.
+        k (int): The maximum number of neighbours used for a prediction.
+        rating_scale (tuple): The lowest and highest rating.
+        """
+        self.metric = metric
+        self.rating_scale = rating_scale
+        self.model = KNNBasic(k=k, sim_options={'name': metric, 'user_based': True})
+        self.trainset = None
+        self.testset = []
+        self.movies = None
+        self.rated_movies = {}
+        self._predictions = None
+        self._movie_columns = None
+
+    def fit(self, processed_data, test_size=0.2, random_state=42):
+        """
+        Fits the model on the ratings.
+
+        Parameters:
+        processed_data (pandas.DataFrame): The ratings with columns ['Osoba', 'Nazwa', 'Ocena'].
+        test_size (float): The part of the ratings kept for the test dataset, or None to train on all of them.
+        random_state (int): The seed of the split.
+
+        Returns:
+        MovieRecommender: The recommender itself.
+        """
+        data = Dataset.load_from_df(processed_data[['Osoba', 'Nazwa', 'Ocena']], Reader(rating_scale=self.rating_scale))
+        if test_size:
+            self.trainset, self.testset = train_test_split(data, test_size=test_size, random_state=random_state)
+        else:
+            self.trainset, self.testset = data.build_full_trainset(), []
+        self.model.fit(self.trainset)
+
+        self.movies = processed_data['Nazwa'].unique()
+        self.rated_movies = {user: set(movies) for user, movies in processed_data.groupby('Osoba')['Nazwa']}
+        items = self.trainset._raw2inner_id_items
+        self._movie_columns = np.array([items.get(movie, -1) for movie in self.movies], dtype=int)
+        self._predictions = None
+        return self
+
+    def __contains__(self, user):
+        return user in self.rated_movies
+
+    def update(self, new_ratings):
+        """
+        Adds new ratings or changes existing ones without fitting the model again.
+
+        The ratings are added to the training dataset, and only the rows and columns of the similarity matrix
+        of the users with new ratings are computed again (with the formulas of Surprise, see sparse_recommender.py).
+        The result is the same as fitting on all the ratings.
+
+        Parameters:
+        new_ratings (pandas.DataFrame): The ratings with columns ['Osoba', 'Nazwa', 'Ocena'].
+
+        Returns:
+        list: The inner ids of the users whose similarities were computed again.
+        """
+        trainset = self.trainset
+        users, items = trainset._raw2inner_id_users, trainset._raw2inner_id_items
+        new_ratings = new_ratings.drop_duplicates(['Osoba', 'Nazwa'], keep='last')
+        changed = set()
+        for user, movie, rating in new_ratings[['Osoba', 'Nazwa', 'Ocena']].itertuples(index=False):
+            user_id = users.setdefault(user, len(users))
+            movie_id = items.setdefault(movie, len(items))
+            user_ratings, movie_ratings = trainset.ur[user_id], trainset.ir[movie_id]
+            if any(item == movie_id for item, _ in user_ratings):
+                user_ratings[:] = [(item, rating if item == movie_id else r) for item, r in user_ratings]
+                movie_ratings[:] = [(other, rating if other == user_id else r) for other, r in movie_ratings]
+            else:
+                user_ratings.append((movie_id, rating))
+                movie_ratings.append((user_id, rating))
+                trainset.n_ratings += 1
+            changed.add(user_id)
+            self.rated_movies.setdefault(user, set()).add(movie)
+        new_pairs = set(zip(new_ratings['Osoba'], new_ratings['Nazwa']))
+        self.testset = [(user, movie, rating) for user, movie, rating in self.testset if (user, movie) not in new_pairs]
+
+        trainset.n_users, trainset.n_items = len(users), len(items)
+        trainset._global_mean = None
+        trainset._inner2raw_id_users = trainset._inner2raw_id_items = None
+        self.model.n_x, self.model.n_y = trainset.n_users, trainset.n_items
+
+        similarities = np.asarray(self.model.sim)
+        if similarities.shape[0] < trainset.n_users:
+            grown = np.zeros((trainset.n_users, trainset.n_users))
+            grown[:similarities.shape[0], :similarities.shape[0]] = similarities
+            similarities = grown
+        changed = sorted(changed)
+        entries = [(user, item, rating) for user, user_ratings in trainset.ur.items() for item, rating in user_ratings]
+        user_ids, item_ids, values = zip(*entries)
+        ratings = sparse.csr_matrix((values, (user_ids, item_ids)), shape=(trainset.n_users, trainset.n_items))
+        rows = chunk_similarities(SimilarityTerms(ratings), np.array(changed), self.metric)
+        similarities[changed, :] = rows
+        similarities[:, changed] = rows.T
+        similarities[changed, changed] = 1
+        self.model.sim = similarities
+
+        new_movies = pd.Index(new_ratings['Nazwa'].unique()).difference(pd.Index(self.movies), sort=False)
+        self.movies = np.concatenate([self.movies, new_movies.to_numpy(dtype=object)])
+        self._movie_columns = np.array([items.get(movie, -1) for movie in self.movies], dtype=int)
+        self._predictions = None
+        return changed
+
+    def evaluate(self):
+        """
+        Computes the RMSE of the model on the test dataset.
+
+        Returns:
+        float: The RMSE, or None if there is no test dataset.
+        """
+        if not self.testset:
+            return None
+        return accuracy.rmse(self.model.test(self.testset))
+
+    def predicted_ratings(self, user):
+        """
+        Predicts the ratings of all the movies for a user, as model.predict would.
+
+        The ratings of all the users are predicted at once with predict_all on the first call and kept for the next ones.
+
+        Parameters:
+        user (str): The user.
+
+        Returns:
+        numpy.ndarray: The predicted ratings of the movies in the order of self.movies.
+        """
+        if self._predictions is None:
+            self._predictions = predict_all(self.model)[0]
+        default = np.clip(self.trainset.global_mean, *self.trainset.rating_scale)
+        inner_user = self.trainset._raw2inner_id_users.get(user)
+        if inner_user is None:
+            return np.full(len(self.movies), default)
+        row = self._predictions[inner_user]
+        return np.where(self._movie_columns >= 0, row[self._movie_columns], default)
+
+    def predict(self, pairs):
+        """
+        Predicts the ratings of the given users and movies, as model.predict would.
+
+        Parameters:
+        pairs (pandas.DataFrame): The users and movies, in the columns 'Osoba' and 'Nazwa'.
+
+        Returns:
+        numpy.ndarray: The predicted ratings, in the order of the rows.
+        """
+        predictions = np.full(len(pairs), np.clip(self.trainset.global_mean, *self.trainset.rating_scale))
+        movies = pd.Index(self.movies)
+        for user, rows in pairs.groupby('Osoba', sort=False).indices.items():
+            columns = movies.get_indexer(pairs['Nazwa'].to_numpy()[rows])
+            known = columns >= 0
+            predictions[rows[known]] = self.predicted_ratings(user)[columns[known]]
+        return predictions
+
+    def recommend(self, user, n=5):
+        """
+        Provides movie recommendations for a user among the movies the user has not rated.
+
+        Parameters:
+        user (str): The user for whom the recommendations are to be generated.
+        n (int): The number of movies recommended and not recommended.
+
+        Returns:
+        tuple: Two lists of tuples, each containing movie names and predicted ratings. The first list is top recommendations, and the second is movies not recommended.
+
+        Raises:
+        KeyError: If the user does not exist in the ratings.
+        """
+        if user not in self:
+            raise KeyError(f'Podany użytkownik nie istnieje w bazie: {user}')
+        candidates = ~pd.Index(self.movies).isin(self.rated_movies[user])
+        movies = self.movies[candidates]
+        ratings = self.predicted_ratings(user)[candidates]
+
+        top = np.argsort(-ratings, kind='stable')[:n]
+        bottom = np.argsort(ratings, kind='stable')[:n]
+        return ([(movies[i], float(ratings[i])) for i in top],
+                [(movies[i], float(ratings[i])) for i in bottom])
+
+    def recommend_many(self, users, n=5):
+        """
+        Provides movie recommendations for many users with one fitted model.
+
+        Parameters:
+        users (iterable of str): The users for whom the recommendations are to be generated.
+        n (int): The number of movies recommended and not recommended for every user.
+
+        Returns:
+        dict: The (top recommendations, movies not recommended) of recommend by user.
+        """
+        return {user: self.recommend(user, n) for user in users}
 
 
 def fetch_movie_info(movie_name):
@@ -111,7 +657,7 @@ def fetch_movie_info(movie_name):
     tuple: Movie year, actors, and IMDB URL if available, otherwise prints error messages.
     """
     try:
-        response = requests.get('https://search.imdbot.workers.dev/', params={'q': movie_name})
+        response = requests.get(API_URL, params={'q': movie_name})
         response.raise_for_status()
         data = response.json()
         if '#YEAR' in data['description'][0] and '#ACTORS' in data['description'][0] and '#IMDB_URL' in \
@@ -129,15 +675,21 @@ def fetch_movie_info(movie_name):
         print(f"Błąd danych: {e}")
 
 
-def print_movie_recommendations(recommendations):
+def print_movie_recommendations(recommendations, descriptions=None):
     """
     Prints movie recommendations along with additional movie information fetched from an API.
 
     Parameters:
     recommendations (list of tuples): A list of tuples, where each tuple contains a movie name and its rating.
+    descriptions (dict): The movie descriptions already fetched with MetadataClient.fetch_many, by movie name.
+    If not given, the information of every movie is fetched one by one with fetch_movie_info.
     """
     for movie, rating in recommendations:
-        year, actors, imdb_url = fetch_movie_info(movie)
+        if descriptions is None:
+            info = fetch_movie_info(movie)
+        else:
+            info = movie_info(descriptions.get(movie))
+        year, actors, imdb_url = info or (None, None, None)
         print(f'''
         =============================================
         {movie}: {rating}
@@ -147,39 +699,64 @@ def print_movie_recommendations(recommendations):
         =============================================
         ''')
 
-processed_data = process_data(SOURCE_FILE)
-reader = Reader(rating_scale=(1, 10))
-data = Dataset.load_from_df(processed_data[['Osoba', 'Nazwa', 'Ocena']], reader)
-
-trainset, testset = train_test_split(data, test_size=0.2, random_state=42)
-
-sim_options_pearson = {
-    'name': 'pearson',
-    'user_based': True
-}
-sim_options_cosine = {
-    'name': 'cosine',
-    'user_based': True
-}
-
-model_pearson = KNNBasic(sim_options=sim_options_pearson)
-model_cosine = KNNBasic(sim_options=sim_options_cosine)
-
-selected_user = input('Podaj użytkownika dla którego chcesz otrzymać rekomendacje: ')
-while processed_data[processed_data['Osoba'] == selected_user].empty:
-    print('Podany użytkownik nie istnieje w bazie!')
-    selected_user = input('\nPodaj użytkownika dla którego chcesz otrzymać rekomendacje: ')
-
-top_recommendations_pearson, do_not_watch_pearson = get_movie_recommendations(model_pearson, trainset, testset, selected_user)
-print('Metryka liczenia odległości: pearson')
-print(f'Top 5 rekomendacji dla użytkownika {selected_user}:')
-print_movie_recommendations(top_recommendations_pearson)
-print(f'\nUżytkownik {selected_user} nie powinien oglądać:')
-print_movie_recommendations(do_not_watch_pearson)
-
-top_recommendations_cosine, do_not_watch_cosine = get_movie_recommendations(model_cosine, trainset, testset, selected_user)
-print('Metryka liczenia odległości: cosine')
-print(f'Top 5 rekomendacji dla użytkownika {selected_user}:')
-print_movie_recommendations(top_recommendations_cosine)
-print(f'\nUżytkownik {selected_user} nie powinien oglądać:')
-print_movie_recommendations(do_not_watch_cosine)
+
+def main():
+    """
+    Runs the command line interface: loads or trains the recommenders and prints the recommendations of the given users.
+    """
+    parser = argparse.ArgumentParser(description='Movie recommendations for the users of the survey.')
+    parser.add_argument('users', nargs='*', help='users for whom the recommendations are generated, asked for if not given')
+    parser.add_argument('--top', type=int, default=5, help='number of movies recommended and not recommended')
+    parser.add_argument('--input', default=SOURCE_FILE,
+                        help=f'saved ratings (.ratings, .parquet, .feather) or Excel file, {EXCEL_SOURCE_FILE} is imported if missing')
+    parser.add_argument('--models', default=MODEL_FILE, help='file of the saved models')
+    parser.add_argument('--retrain', action='store_true', help='train the models even if the saved ones are up to date')
+    parser.add_argument('--backend', choices=['dense', 'sparse'], default='dense',
+                        help='dense Surprise models or the sparse rating matrix of sparse_recommender.py')
+    parser.add_argument('--add-ratings', metavar='FILE',
+                        help='new ratings (.csv, .ratings, .xlsx, ...) to add to the models without training them again')
+    parser.add_argument('--metadata-url', default=API_URL, help='address of the movie information API')
+    parser.add_argument('--metadata-cache', default=METADATA_CACHE_FILE, help='cache file of the movie information')
+    args = parser.parse_args()
+
+    if args.retrain and os.path.isfile(args.models):
+        os.remove(args.models)
+    if args.add_ratings:
+        artifact = add_ratings(process_data(args.add_ratings), ensure_source(args.input), args.models, args.backend)
+    else:
+        artifact = load_or_train(ensure_source(args.input), args.models, args.backend)
+    recommenders = artifact['models']
+
+    users = args.users
+    if not users:
+        selected_user = input('Podaj użytkownika dla którego chcesz otrzymać rekomendacje: ')
+        while selected_user not in recommenders['pearson']:
+            print('Podany użytkownik nie istnieje w bazie!')
+            selected_user = input('\nPodaj użytkownika dla którego chcesz otrzymać rekomendacje: ')
+        users = [selected_user]
+
+    unknown = [user for user in users if user not in recommenders['pearson']]
+    if unknown:
+        print(f'Podany użytkownik nie istnieje w bazie! {", ".join(unknown)}')
+        return
+
+    results = {metric: recommender.recommend_many(users, args.top) for metric, recommender in recommenders.items()}
+
+    cache = MetadataCache(args.metadata_cache)
+    client = MetadataClient(args.metadata_url, cache)
+    descriptions = client.fetch_many(movie for recommendations in results.values()
+                                     for top_recommendations, do_not_watch in recommendations.values()
+                                     for movie, _ in top_recommendations + do_not_watch)
+    client.close()
+    cache.close()
+
+    for metric, recommendations in results.items():
+        for selected_user, (top_recommendations, do_not_watch) in recommendations.items():
+            print(f'Metryka liczenia odległości: {metric}')
+            print(f'Top {args.top} rekomendacji dla użytkownika {selected_user}:')
+            print_movie_recommendations(top_recommendations, descriptions)
+            print(f'\nUżytkownik {selected_user} nie powinien oglądać:')
+            print_movie_recommendations(do_not_watch, descriptions)
+
+if __name__ == '__main__':
+    main()
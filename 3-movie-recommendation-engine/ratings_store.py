@@ -0,0 +1,182 @@
+"""
+The module saves and loads the ratings table (columns 'Osoba', 'Nazwa', 'Ocena') in a fast binary format,
+so the recommender does not have to parse the Excel file on every run.
+
+The format is chosen by the file extension:
+- .ratings - a directory with NumPy arrays (the user and movie codes and the ratings, memory-mapped when loaded)
+  and the lists of the user and movie names. It needs only NumPy.
+- .parquet and .feather - the columnar formats of pandas. They need the pyarrow package.
+- .csv - a text table, e.g. for the new ratings added with --add-ratings.
+- .xlsx - the survey sheet, read like in process_data and written by ratings_to_sheet. It is kept only for import and export.
+
+
+How to run
+---
+Convert the survey with: python3 ratings_store.py parsed_data.xlsx parsed_data.ratings
+Compare the load times with: python3 benchmark_load.py
+"""
+import json
+import os
+import shutil
+import sys
+
+import numpy as np
+import pandas as pd
+
+EXCEL_EXTENSIONS = ('.xlsx', '.xls')
+
+
+def save_numpy(ratings, directory):
+    """
+    Saves the ratings as NumPy arrays in a directory.
+
+    The directory is written under a temporary name. The old directory is renamed aside, the new one is renamed
+into its place and only then the old one is deleted, so a broken store is never left behind. After a crash
+between the two renames, recover_numpy puts the old directory back.
+
+    Parameters:
+    ratings (pandas.DataFrame): The ratings with columns ['Osoba', 'Nazwa', 'Ocena'].
+    directory (str): The path to the directory.
+    """
+    recover_numpy(directory)
+    temporary = f'{directory}.{os.getpid()}.tmp'
+    os.makedirs(temporary, exist_ok=True)
+    for column, name in (('Osoba', 'users'), ('Nazwa', 'movies')):
+        codes, names = pd.factorize(ratings[column])
+        np.save(os.path.join(temporary, f'{name}.npy'), codes.astype(np.int32))
+        with open(os.path.join(temporary, f'{name}.json'), 'w', encoding='utf-8') as file:
+            json.dump(names.tolist(), file, ensure_ascii=False)
+    np.save(os.path.join(temporary, 'ratings.npy'), ratings['Ocena'].to_numpy(dtype=float))
+
+    backup = directory + '.old'
+    if os.path.isdir(directory):
+        if os.path.isdir(backup):
+            shutil.rmtree(backup)
+        os.replace(directory, backup)
+    os.replace(temporary, directory)
+    shutil.rmtree(backup, ignore_errors=True)
+
+
+def recover_numpy(directory):
+    """
+    Puts back the previous directory of save_numpy if a crash left only that one.
+
+    Parameters:
+    directory (str): The path to the directory.
+    """
+    backup = directory + '.old'
+    if not os.path.exists(directory) and os.path.isdir(backup):
+        os.replace(backup, directory)
+
+
+def load_numpy(directory):
+    """
+    Loads the ratings saved with save_numpy. The arrays are memory-mapped, not read and parsed.
+
+    Parameters:
+    directory (str): The path to the directory.
+
+    Returns:
+    pandas.DataFrame: The ratings with columns ['Osoba', 'Nazwa', 'Ocena'].
+    """
+    columns = {}
+    for column, name in (('Osoba', 'users'), ('Nazwa', 'movies')):
+        with open(os.path.join(directory, f'{name}.json'), encoding='utf-8') as file:
+            names = np.array(json.load(file), dtype=object)
+        columns[column] = names[np.load(os.path.join(directory, f'{name}.npy'), mmap_mode='r')]
+    columns['Ocena'] = np.load(os.path.join(directory, 'ratings.npy'), mmap_mode='r')
+    return pd.DataFrame(columns)
+
+
+def ratings_to_sheet(ratings):
+    """
+    Transforms the ratings back to the layout of the survey sheet, one row per user with pairs of Nazwa/Ocena columns.
+
+    Parameters:
+    ratings (pandas.DataFrame): The ratings with columns ['Osoba', 'Nazwa', 'Ocena'].
+
+    Returns:
+    pandas.DataFrame: The survey sheet, which process_data reads back to the same ratings.
+    """
+    users = pd.unique(ratings['Osoba'])
+    positions = ratings.groupby('Osoba', sort=False).cumcount().to_numpy()
+    columns = {'Osoba': users}
+    for position in range(positions.max() + 1 if len(ratings) else 0):
+        answers = ratings[positions == position].set_index('Osoba')
+        suffix = f'.{position}' if position else ''
+        columns['Nazwa' + suffix] = answers['Nazwa'].reindex(users).to_numpy()
+        columns['Ocena' + suffix] = answers['Ocena'].reindex(users).to_numpy()
+    return pd.DataFrame(columns)
+
+
+def save_ratings(ratings, path):
+    """
+    Saves the ratings in the format given by the extension of the path.
+
+    Parameters:
+    ratings (pandas.DataFrame): The ratings with columns ['Osoba', 'Nazwa', 'Ocena'].
+    path (str): The path to the file or directory (.ratings, .parquet, .feather, .csv or .xlsx).
+
+    Raises:
+    ImportError: If the format needs pyarrow and it is not installed.
+    """
+    ratings = ratings[['Osoba', 'Nazwa', 'Ocena']].reset_index(drop=True)
+    extension = os.path.splitext(path)[1].lower()
+    if extension == '.parquet':
+        ratings.to_parquet(path, index=False)
+    elif extension == '.feather':
+        ratings.to_feather(path)
+    elif extension == '.csv':
+        ratings.to_csv(path, index=False)
+    elif extension in EXCEL_EXTENSIONS:
+        ratings_to_sheet(ratings).to_excel(path, index=False)
+    else:
+        save_numpy(ratings, path)
+
+
+def load_ratings(path):
+    """
+    Loads the ratings in the format given by the extension of the path.
+
+    Parameters:
+    path (str): The path to the file or directory (.ratings, .parquet, .feather or .csv).
+
+    Returns:
+    pandas.DataFrame: The ratings with columns ['Osoba', 'Nazwa', 'Ocena'].
+
+    Raises:
+    FileNotFoundError: If the file does not exist.
+    ImportError: If the format needs pyarrow and it is not installed.
+    """
+    recover_numpy(path)
+    if not os.path.exists(path):
+        raise FileNotFoundError(f"Nie znaleziono pliku: {path}")
+    extension = os.path.splitext(path)[1].lower()
+    if extension == '.parquet':
+        return pd.read_parquet(path)
+    if extension == '.feather':
+        return pd.read_feather(path)
+    if extension == '.csv':
+        return pd.read_csv(path)
+    return load_numpy(path)
+
+
+def is_excel(path):
+    """
+    Checks if the path is an Excel file.
+
+    Parameters:
+    path (str): The path to the file.
+
+    Returns:
+    bool: True for the .xlsx and .xls files.
+    """
+    return os.path.splitext(path)[1].lower() in EXCEL_EXTENSIONS
+
+
+if __name__ == '__main__':
+    from movie_recommendation_engine import process_data
+
+    source, target = sys.argv[1], sys.argv[2]
+    save_ratings(process_data(source), target)
+    print(f'Zapisano oceny z {source} do {target}')
@@ -0,0 +1,431 @@
+"""
+The module contains a recommender with a sparse rating matrix, for many more users and movies than the survey has.
+
+The ratings are kept in a SciPy CSR matrix (users x movies). The similarities between users are computed
+a chunk of users at a time with sparse matrix products, with the same Pearson and Cosine formulas as Surprise
+(over the movies rated by both users). Only the top neighbours of every user are kept, so the full
+user x user similarity matrix is never held in memory.
+
+A rating is predicted like in KNNBasic: the weighted average of the ratings of the k most similar neighbours
+who rated the movie, counting only the neighbours with a positive similarity. When the number of kept neighbours
+is at least the number of users, the predictions are the same as those of KNNBasic (up to the ties of similarity).
+
+
+How to run
+---
+Use it like MovieRecommender, e.g. SparseRecommender('pearson', neighbours=200).fit(process_data(SOURCE_FILE))
+or from the command line with: python3 movie_recommendation_engine.py --backend sparse
+"""
+import numpy as np
+import pandas as pd
+from scipy import sparse
+
+
+def rating_matrix(processed_data, users, movies):
+    """
+    Builds the sparse user x movie rating matrix.
+
+    Parameters:
+    processed_data (pandas.DataFrame): The ratings with columns ['Osoba', 'Nazwa', 'Ocena'], one per user and movie.
+    users (pandas.Index): The users, in the order of the rows.
+    movies (pandas.Index): The movies, in the order of the columns.
+
+    Returns:
+    scipy.sparse.csr_matrix: The ratings, with no entry where a movie is not rated.
+    """
+    rows = users.get_indexer(processed_data['Osoba'])
+    columns = movies.get_indexer(processed_data['Nazwa'])
+    values = processed_data['Ocena'].to_numpy(dtype=float)
+    return sparse.csr_matrix((values, (rows, columns)), shape=(len(users), len(movies)))
+
+
+class SimilarityTerms:
+    def __init__(self, ratings):
+        """
+        Precomputes the matrices whose products give the sums of the similarity formulas.
+
+        Parameters:
+        ratings (scipy.sparse.csr_matrix): The user x movie ratings.
+
+        Attributes:
+        rated (scipy.sparse.csr_matrix): 1 where a movie is rated.
+        squares (scipy.sparse.csr_matrix): The squared ratings.
+        ratings_t, rated_t, squares_t (scipy.sparse.csr_matrix): The transposed matrices (movies x users).
+        """
+        self.ratings = ratings
+        self.rated = ratings.copy()
+        self.rated.data[:] = 1.0
+        self.squares = ratings.multiply(ratings).tocsr()
+        self.ratings_t = ratings.T.tocsr()
+        self.rated_t = self.rated.T.tocsr()
+        self.squares_t = self.squares.T.tocsr()
+
+
+def chunk_similarities(terms, rows, metric='pearson', min_support=1):
+    """
+    Computes the similarities between a chunk of users and all the users.
+
+    The sums over the movies rated by both users are sparse matrix products, so the formulas are the same
+    as in surprise.similarities.
+
+    Parameters:
+    terms (SimilarityTerms): The precomputed matrices of the ratings.
+    rows (slice or numpy.ndarray): The users of the chunk.
+    metric (str): 'pearson' or 'cosine'.
+    min_support (int): The minimum number of common movies, below it the similarity is 0.
+
+    Returns:
+    numpy.ndarray: The similarities (chunk users x all users).
+
+    Raises:
+    ValueError: If the metric is not supported.
+    """
+    chunk, chunk_rated, chunk_squares = terms.ratings[rows], terms.rated[rows], terms.squares[rows]
+
+    common = (chunk_rated @ terms.rated_t).toarray()
+    products = (chunk @ terms.ratings_t).toarray()
+    squares_i = (chunk_squares @ terms.rated_t).toarray()
+    squares_j = (chunk_rated @ terms.squares_t).toarray()
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        if metric == 'cosine':
+            similarities = products / np.sqrt(squares_i * squares_j)
+        elif metric == 'pearson':
+            sums_i = (chunk @ terms.rated_t).toarray()
+            sums_j = (chunk_rated @ terms.ratings_t).toarray()
+            numerator = common * products - sums_i * sums_j
+            denominator = np.sqrt((common * squares_i - sums_i ** 2) * (common * squares_j - sums_j ** 2))
+            similarities = np.where(denominator == 0, 0.0, numerator / denominator)
+        else:
+            raise ValueError(f'Nieobsługiwana metryka: {metric}')
+
+    similarities[(common < min_support) | ~np.isfinite(similarities)] = 0.0
+    return similarities
+
+
+def select_neighbours(similarities, users, neighbours):
+    """
+    Picks the most similar users from the rows of a similarity matrix.
+
+    Parameters:
+    similarities (numpy.ndarray): The similarities between the given users and all the users, changed in place.
+    users (numpy.ndarray): The indices of the users of the rows.
+    neighbours (int): The number of neighbours kept for every user.
+
+    Returns:
+    tuple: The neighbour indices (-1 where there are fewer neighbours with a positive similarity)
+    and their similarities, both sorted from the most similar neighbour and then by the index.
+    """
+    n_users = similarities.shape[1]
+    similarities[np.arange(len(users)), users] = -np.inf
+    if neighbours < n_users:
+        # All the users above the k-th similarity and the lowest indices among the users equal to it
+        kth = -np.partition(-similarities, neighbours - 1, axis=1)[:, neighbours - 1:neighbours]
+        above = similarities > kth
+        equal = similarities == kth
+        picked = above | (equal & (np.cumsum(equal, axis=1) <= neighbours - above.sum(axis=1, keepdims=True)))
+        nearest = np.nonzero(picked)[1].reshape(len(users), neighbours)
+    else:
+        nearest = np.tile(np.arange(n_users), (len(users), 1))
+    nearest_similarities = np.take_along_axis(similarities, nearest, axis=1)
+    order = np.lexsort((nearest, -nearest_similarities), axis=1)
+    nearest = np.take_along_axis(nearest, order, axis=1)[:, :neighbours]
+    nearest_similarities = np.take_along_axis(nearest_similarities, order, axis=1)[:, :neighbours]
+
+    positive = nearest_similarities > 0
+    return np.where(positive, nearest, -1), np.where(positive, nearest_similarities, 0.0)
+
+
+def top_neighbours(ratings, metric='pearson', neighbours=100, min_support=1, chunk_size=None):
+    """
+    Finds the most similar users of every user, a chunk of users at a time.
+
+    Parameters:
+    ratings (scipy.sparse.csr_matrix): The user x movie ratings.
+    metric (str): 'pearson' or 'cosine'.
+    neighbours (int): The number of neighbours kept for every user.
+    min_support (int): The minimum number of common movies, below it the similarity is 0.
+    chunk_size (int): The number of users per chunk, by default chosen to keep a chunk under about 16 MB.
+
+    Returns:
+    tuple: The neighbour indices (users x neighbours, -1 where there are fewer neighbours with a positive similarity)
+    and their similarities, both sorted from the most similar neighbour.
+    """
+    n_users = ratings.shape[0]
+    neighbours = max(1, min(neighbours, n_users - 1))
+    if chunk_size is None:
+        chunk_size = max(1, 2 * 1024 * 1024 // max(1, n_users))
+
+    terms = SimilarityTerms(ratings)
+    indices = np.full((n_users, neighbours), -1, dtype=np.int64)
+    similarities = np.zeros((n_users, neighbours))
+    for start in range(0, n_users, chunk_size):
+        users = np.arange(start, min(start + chunk_size, n_users))
+        chunk = chunk_similarities(terms, users, metric, min_support)
+        indices[users], similarities[users] = select_neighbours(chunk, users, neighbours)
+    return indices, similarities
+
+
+def set_ratings(matrix, rows, columns, values):
+    """
+    Sets entries of a sparse matrix, replacing the entries that already exist.
+
+    Parameters:
+    matrix (scipy.sparse.csr_matrix): The matrix.
+    rows (numpy.ndarray): The rows of the entries.
+    columns (numpy.ndarray): The columns of the entries.
+    values (numpy.ndarray): The values of the entries.
+
+    Returns:
+    scipy.sparse.csr_matrix: The new matrix.
+    """
+    entries = matrix.tocoo()
+    replaced = pd.MultiIndex.from_arrays([entries.row, entries.col]).isin(pd.MultiIndex.from_arrays([rows, columns]))
+    return sparse.csr_matrix((np.concatenate([entries.data[~replaced], values]),
+                              (np.concatenate([entries.row[~replaced], rows]),
+                               np.concatenate([entries.col[~replaced], columns]))), shape=matrix.shape)
+
+
+class SparseRecommender:
+    def __init__(self, metric='pearson', k=40, neighbours=100, min_k=1, min_support=1, rating_scale=(1, 10),
+                 chunk_size=None):
+        """
+        Initializes a user-based recommender with a sparse rating matrix. Nothing is read or trained until fit is called.
+
+        Parameters:
+        metric (str): The similarity metric between users, 'pearson' or 'cosine'.
+        k (int): The maximum number of neighbours used for a prediction.
+        neighbours (int): The number of the most similar users kept for every user.
+        min_k (int): The minimum number of neighbours for a prediction, otherwise the mean rating is predicted.
+        min_support (int): The minimum number of common movies of two users, below it their similarity is 0.
+        rating_scale (tuple): The lowest and highest rating.
+        chunk_size (int): The number of users whose similarities are computed at once.
+        """
+        self.metric = metric
+        self.k = k
+        self.neighbours = neighbours
+        self.min_k = min_k
+        self.min_support = min_support
+        self.rating_scale = rating_scale
+        self.chunk_size = chunk_size
+        self.users = None
+        self.movies = None
+        self.ratings = None
+        self.rated = None
+        self.testset = None
+        self.global_mean = None
+        self.neighbour_indices = None
+        self.neighbour_similarities = None
+
+    def fit(self, processed_data, test_size=0.2, random_state=42):
+        """
+        Builds the sparse rating matrix and finds the neighbours of every user.
+
+        A user who rated the same movie more than once is counted with the last rating.
+
+        Parameters:
+        processed_data (pandas.DataFrame): The ratings with columns ['Osoba', 'Nazwa', 'Ocena'].
+        test_size (float): The part of the ratings kept for the test dataset, or None to train on all of them.
+        random_state (int): The seed of the split.
+
+        Returns:
+        SparseRecommender: The recommender itself.
+        """
+        processed_data = processed_data.drop_duplicates(['Osoba', 'Nazwa'], keep='last')
+        self.users = pd.Index(processed_data['Osoba'].unique())
+        self.movies = pd.Index(processed_data['Nazwa'].unique())
+        self.rated = rating_matrix(processed_data, self.users, self.movies).astype(bool)
+
+        test = np.zeros(len(processed_data), dtype=bool)
+        if test_size:
+            shuffled = np.random.default_rng(random_state).permutation(len(processed_data))
+            test[shuffled[:int(round(test_size * len(processed_data)))]] = True
+        self.testset = processed_data[test]
+        train = processed_data[~test]
+
+        self.ratings = rating_matrix(train, self.users, self.movies)
+        self.global_mean = train['Ocena'].mean()
+        self.neighbour_indices, self.neighbour_similarities = top_neighbours(
+            self.ratings, self.metric, self.neighbours, self.min_support, self.chunk_size)
+        return self
+
+    def __contains__(self, user):
+        return self.users is not None and user in self.users
+
+    def update(self, new_ratings):
+        """
+        Adds new ratings or changes existing ones without fitting the model again.
+
+        Only the similarities of the users with new ratings are computed again. The neighbour lists of the other users
+        are merged with the new similarities. A full list that loses one of those users as a neighbour is computed again,
+        because its next neighbour is not known. The result is the same as fitting on all the ratings.
+
+        Parameters:
+        new_ratings (pandas.DataFrame): The ratings with columns ['Osoba', 'Nazwa', 'Ocena'].
+
+        Returns:
+        numpy.ndarray: The indices of the users whose neighbour lists changed.
+        """
+        new_ratings = new_ratings.drop_duplicates(['Osoba', 'Nazwa'], keep='last')
+        self.users = self.users.append(pd.Index(new_ratings['Osoba'].unique()).difference(self.users, sort=False))
+        self.movies = self.movies.append(pd.Index(new_ratings['Nazwa'].unique()).difference(self.movies, sort=False))
+        n_users = len(self.users)
+        shape = (n_users, len(self.movies))
+        self.ratings.resize(shape)
+        self.rated.resize(shape)
+
+        rows = self.users.get_indexer(new_ratings['Osoba'])
+        columns = self.movies.get_indexer(new_ratings['Nazwa'])
+        values = new_ratings['Ocena'].to_numpy(dtype=float)
+        self.ratings = set_ratings(self.ratings, rows, columns, values)
+        self.rated = set_ratings(self.rated, rows, columns, np.ones(len(values))).astype(bool)
+        self.global_mean = self.ratings.data.mean()
+
+        old_width = self.neighbour_indices.shape[1]
+        width = max(1, min(self.neighbours, n_users - 1))
+        indices = np.full((n_users, width), -1, dtype=np.int64)
+        similarities = np.zeros((n_users, width))
+        old_users = self.neighbour_indices.shape[0]
+        indices[:old_users, :old_width] = self.neighbour_indices
+        similarities[:old_users, :old_width] = self.neighbour_similarities
+        was_full = np.zeros(n_users, dtype=bool)
+        was_full[:old_users] = (self.neighbour_indices >= 0).all(axis=1) & (old_width == width)
+
+        terms = SimilarityTerms(self.ratings)
+        changed = np.unique(rows)
+        changed_similarities = chunk_similarities(terms, changed, self.metric, self.min_support)
+        new_similarities = changed_similarities.T.copy()
+        indices[changed], similarities[changed] = select_neighbours(changed_similarities, changed, width)
+
+        # The other users: drop the changed users from the lists and merge them back with their new similarities
+        others = np.setdiff1d(np.arange(n_users), changed)
+        listed = np.isin(indices[others], changed)
+        touched = others[listed.any(axis=1) | (new_similarities[others] > 0).any(axis=1)]
+        listed = np.isin(indices[touched], changed)
+        position = np.searchsorted(changed, np.where(listed, indices[touched], changed[0]))
+        dropped = listed & (new_similarities[touched[:, None], position] < similarities[touched])
+        recompute = touched[was_full[touched] & dropped.any(axis=1)]
+        merge = np.setdiff1d(touched, recompute)
+
+        if len(recompute):
+            chunk = chunk_similarities(terms, recompute, self.metric, self.min_support)
+            indices[recompute], similarities[recompute] = select_neighbours(chunk, recompute, width)
+        if len(merge):
+            kept = ~np.isin(indices[merge], changed) & (indices[merge] >= 0)
+            candidates = np.concatenate([np.where(kept, indices[merge], -1), np.tile(changed, (len(merge), 1))], axis=1)
+            candidate_similarities = np.concatenate([np.where(kept, similarities[merge], -np.inf),
+                                                     new_similarities[merge]], axis=1)
+            candidate_similarities[candidates < 0] = -np.inf
+            order = np.lexsort((candidates, -candidate_similarities), axis=1)[:, :width]
+            nearest = np.take_along_axis(candidates, order, axis=1)
+            nearest_similarities = np.take_along_axis(candidate_similarities, order, axis=1)
+            positive = nearest_similarities > 0
+            indices[merge] = np.where(positive, nearest, -1)
+            similarities[merge] = np.where(positive, nearest_similarities, 0.0)
+
+        self.neighbour_indices, self.neighbour_similarities = indices, similarities
+        return np.union1d(changed, touched)
+
+    def predicted_ratings(self, user):
+        """
+        Predicts the ratings of all the movies for a user from the ratings of the user's neighbours.
+
+        Parameters:
+        user (str): The user.
+
+        Returns:
+        numpy.ndarray: The predicted ratings of the movies in the order of self.movies.
+        """
+        lower_bound, higher_bound = self.rating_scale
+        default = np.clip(self.global_mean, lower_bound, higher_bound)
+        position = self.users.get_loc(user)
+        kept = self.neighbour_indices[position] >= 0
+        neighbours = self.neighbour_indices[position][kept]
+        similarities = self.neighbour_similarities[position][kept]
+        if not len(neighbours):
+            return np.full(len(self.movies), default)
+
+        neighbour_ratings = self.ratings[neighbours]
+        columns = np.unique(neighbour_ratings.indices)
+        values = neighbour_ratings[:, columns].toarray()
+        used = (values != 0) & (np.cumsum(values != 0, axis=0) <= self.k)
+        weights = np.where(used, similarities[:, None], 0.0)
+
+        predictions = np.full(len(self.movies), default)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            estimates = (weights * values).sum(axis=0) / weights.sum(axis=0)
+        enough = used.sum(axis=0) >= self.min_k
+        predictions[columns[enough]] = np.clip(estimates[enough], lower_bound, higher_bound)
+        return predictions
+
+    def evaluate(self):
+        """
+        Computes the RMSE of the model on the test dataset and prints it like surprise.accuracy.rmse.
+
+        Returns:
+        float: The RMSE, or None if there is no test dataset.
+        """
+        if self.testset is None or self.testset.empty:
+            return None
+        errors = self.predict(self.testset) - self.testset['Ocena'].to_numpy(dtype=float)
+        rmse = float(np.sqrt(np.mean(errors ** 2)))
+        print(f'RMSE: {rmse:1.4f}')
+        return rmse
+
+    def predict(self, pairs):
+        """
+        Predicts the ratings of the given users and movies.
+
+        Parameters:
+        pairs (pandas.DataFrame): The users and movies, in the columns 'Osoba' and 'Nazwa'.
+
+        Returns:
+        numpy.ndarray: The predicted ratings, in the order of the rows.
+        """
+        predictions = np.full(len(pairs), np.clip(self.global_mean, *self.rating_scale))
+        for user, rows in pairs.groupby('Osoba', sort=False).indices.items():
+            if user not in self:
+                continue
+            columns = self.movies.get_indexer(pairs['Nazwa'].to_numpy()[rows])
+            known = columns >= 0
+            predictions[rows[known]] = self.predicted_ratings(user)[columns[known]]
+        return predictions
+
+    def recommend(self, user, n=5):
+        """
+        Provides movie recommendations for a user among the movies the user has not rated.
+
+        Parameters:
+        user (str): The user for whom the recommendations are to be generated.
+        n (int): The number of movies recommended and not recommended.
+
+        Returns:
+        tuple: Two lists of tuples, each containing movie names and predicted ratings. The first list is top recommendations, and the second is movies not recommended.
+
+        Raises:
+        KeyError: If the user does not exist in the ratings.
+        """
+        if user not in self:
+            raise KeyError(f'Podany użytkownik nie istnieje w bazie: {user}')
+        candidates = np.ones(len(self.movies), dtype=bool)
+        candidates[self.rated[self.users.get_loc(user)].indices] = False
+        movies = self.movies[candidates]
+        ratings = self.predicted_ratings(user)[candidates]
+
+        top = np.argsort(-ratings, kind='stable')[:n]
+        bottom = np.argsort(ratings, kind='stable')[:n]
+        return ([(movies[i], float(ratings[i])) for i in top],
+                [(movies[i], float(ratings[i])) for i in bottom])
+
+    def recommend_many(self, users, n=5):
+        """
+        Provides movie recommendations for many users with one fitted model.
+
+        Parameters:
+        users (iterable of str): The users for whom the recommendations are to be generated.
+        n (int): The number of movies recommended and not recommended for every user.
+
+        Returns:
+        dict: The (top recommendations, movies not recommended) of recommend by user.
+        """
+        return {user: self.recommend(user, n) for user in users}
@@ -0,0 +1,79 @@
+"""
+The module is a local stub of the IMDb search API, for trying out and timing the metadata fetching without the Internet.
+
+It answers GET /?q=NAME with a JSON in the format of https://search.imdbot.workers.dev/,
+with a made-up movie, after the given delay that imitates the latency of the real API.
+It serves every request in its own thread and records the queries in server.queries.
+
+
+How to run
+---
+Run the server with: python3 stub_metadata_server.py --port 8766 --delay 0.1
+and use it with: MetadataClient('http://127.0.0.1:8766/')
+"""
+import argparse
+import json
+import threading
+import time
+import zlib
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse, parse_qs
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def do_GET(self):
+        query = parse_qs(urlparse(self.path).query).get('q', [''])[0]
+        self.server.queries.append(query)
+        time.sleep(self.server.delay)
+        body = json.dumps({'ok': True, 'description': [{
+            '#TITLE': query.strip().title(),
+            '#YEAR': 2000 + len(query) % 25,
+            '#ACTORS': 'Jan Kowalski, Anna Nowak',
+            '#IMDB_URL': f'https://imdb.com/title/tt{zlib.crc32(query.encode()) % 10 ** 7:07d}/',
+        }] if query else []}).encode()
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def start_stub_server(port=0, delay=0.1):
+    """
+    Starts the stub server in a background thread.
+
+    Parameters:
+    port (int): The port to listen on, 0 for any free port.
+    delay (float): The time in seconds before every answer.
+
+    Returns:
+    http.server.ThreadingHTTPServer: The running server, stop it with shutdown(). Its queries attribute
+    is the list of the queries received.
+    """
+    server = ThreadingHTTPServer(('127.0.0.1', port), StubHandler)
+    server.daemon_threads = True
+    server.delay = delay
+    server.queries = []
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Local stub of the IMDb search API.')
+    parser.add_argument('--port', type=int, default=8766, help='port to listen on')
+    parser.add_argument('--delay', type=float, default=0.1, help='delay of every answer in seconds')
+    args = parser.parse_args()
+
+    stub = ThreadingHTTPServer(('127.0.0.1', args.port), StubHandler)
+    stub.delay = args.delay
+    stub.queries = []
+    print(f'Listening on 127.0.0.1:{args.port}')
+    try:
+        stub.serve_forever()
+    except KeyboardInterrupt:
+        pass
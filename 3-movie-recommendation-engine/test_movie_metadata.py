@@ -0,0 +1,59 @@
+"""
+The tests of movie_metadata.py against the local stub of the IMDb search API (stub_metadata_server.py).
+
+
+How to run
+---
+Run the tests with: python3 -m unittest test_movie_metadata
+"""
+import os
+import tempfile
+import time
+import unittest
+
+from movie_metadata import MetadataClient, MetadataCache
+from stub_metadata_server import start_stub_server
+
+
+class MetadataClientTest(unittest.TestCase):
+    def setUp(self):
+        self.server = start_stub_server(delay=0.01)
+        self.url = f'http://127.0.0.1:{self.server.server_address[1]}/'
+        self.directory = tempfile.TemporaryDirectory()
+        self.cache_file = os.path.join(self.directory.name, 'metadata_cache.db')
+
+    def tearDown(self):
+        self.server.shutdown()
+        self.server.server_close()
+        self.directory.cleanup()
+
+    def fetch_many(self, movies, ttl=3600):
+        cache = MetadataCache(self.cache_file, ttl=ttl)
+        client = MetadataClient(self.url, cache, workers=4)
+        try:
+            return client.fetch_many(movies)
+        finally:
+            client.close()
+            cache.close()
+
+    def test_one_request_per_unique_title(self):
+        descriptions = self.fetch_many(['Inception', 'Se7en', 'Inception', 'Heat', 'Se7en'])
+        self.assertEqual(sorted(self.server.queries), ['Heat', 'Inception', 'Se7en'])
+        self.assertEqual(list(descriptions), ['Inception', 'Se7en', 'Heat'])
+        self.assertEqual(descriptions['Se7en']['#TITLE'], 'Se7En')
+
+    def test_second_call_is_served_from_cache(self):
+        first = self.fetch_many(['Inception', 'Heat'])
+        second = self.fetch_many(['Heat', 'Inception'])
+        self.assertEqual(len(self.server.queries), 2)
+        self.assertEqual(first, second)
+
+    def test_expired_entries_are_fetched_again(self):
+        self.fetch_many(['Inception'], ttl=0)
+        time.sleep(0.01)
+        self.fetch_many(['Inception'], ttl=0)
+        self.assertEqual(self.server.queries, ['Inception', 'Inception'])
+
+
+if __name__ == '__main__':
+    unittest.main()